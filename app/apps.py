@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "app"
+
+    def ready(self):
+        # Connects the receivers that keep the trip budgets up to date, and
+        # registers the deployment checks.
+        from . import budget, checks  # noqa: F401
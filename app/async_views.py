@@ -0,0 +1,165 @@
+"""
+Async versions of the high-traffic read endpoints, served under api/async/
+with the same payloads as their viewset counterparts. Under ASGI they hold
+no worker while waiting on the client or the database.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+
+from users.authentication import ClaimsJWTAuthentication
+
+from .cache import RECENT_POSTS_TIMEOUT, aposts_version, recent_posts_key
+from .conditional import aconditional_response
+from .models import Column, Trip
+from .pagination import PostPagination, TripPagination
+from .serializers import PostSerializer, TripSerializer
+from .timing import phase
+from .views import (
+    PostViewSet,
+    board_attractions,
+    board_version,
+    group_cards,
+    with_board_version,
+)
+
+jwt_authentication = ClaimsJWTAuthentication()
+
+
+async def authenticate(request):
+    """
+    The user of the request's Bearer token, AnonymousUser without one.
+    Tokens carrying the user claims cost no query; older tokens load the
+    user off the event loop.
+    """
+    header = jwt_authentication.get_header(request)
+    raw_token = header and jwt_authentication.get_raw_token(header)
+    if raw_token is None:
+        return AnonymousUser()
+    token = jwt_authentication.get_validated_token(raw_token)
+    user = jwt_authentication.user_from_claims(token)
+    if user is None:
+        user = await sync_to_async(jwt_authentication.get_user)(token)
+    return user
+
+
+def api_view(login_required=True):
+    """
+    Set request.user from the JWT and answer errors the way DRF does:
+    401 with WWW-Authenticate, and a JSON 404.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            challenge = {
+                "WWW-Authenticate": jwt_authentication.authenticate_header(request)
+            }
+            try:
+                with phase("auth"):
+                    request.user = await authenticate(request)
+            except AuthenticationFailed as e:
+                detail = (
+                    e.detail if isinstance(e.detail, dict) else {"detail": e.detail}
+                )
+                return JsonResponse(detail, status=401, headers=challenge)
+            if login_required and not request.user.is_authenticated:
+                return JsonResponse(
+                    {"detail": NotAuthenticated.default_detail},
+                    status=401,
+                    headers=challenge,
+                )
+            try:
+                return await view(request, *args, **kwargs)
+            except Http404 as e:
+                return JsonResponse({"detail": str(e)}, status=404)
+
+        return require_GET(wrapper)
+
+    return decorator
+
+
+async def paginate(paginator, queryset, request, serialize):
+    # DRF's cursor paginator evaluates the page itself, and synchronously.
+    drf_request = Request(request)
+    page = await sync_to_async(paginator.paginate_queryset)(queryset, drf_request)
+    return JsonResponse(paginator.get_paginated_response(serialize(page)).data)
+
+
+@api_view()
+async def trip_list(request):
+    return await paginate(
+        TripPagination(),
+        request.user.trips.all(),
+        request,
+        lambda trips: TripSerializer(trips, many=True).data,
+    )
+
+
+@api_view()
+async def trip_detail(request, pk):
+    trip = await aget_object_or_404(request.user.trips.all(), pk=pk)
+    return JsonResponse(TripSerializer(trip).data)
+
+
+@api_view()
+async def grouped_attractions(request):
+    trip_id = request.GET.get("trip_id")
+    if not trip_id:
+        return JsonResponse({"error": "trip_id is required"}, status=400)
+    trip = await aget_object_or_404(
+        with_board_version(Trip.objects.all()), id=trip_id, owner=request.user
+    )
+
+    async def render():
+        columns = [
+            column
+            async for column in Column.objects.filter(trip_id=trip).order_by("id")
+        ]
+        cards = [card async for card in board_attractions(columns)]
+        return JsonResponse(group_cards(columns, cards), safe=False)
+
+    return await aconditional_response(request, board_version(trip), None, render)
+
+
+@api_view(login_required=False)
+async def post_list(request):
+    version = await aposts_version()
+
+    async def render():
+        return await paginate(
+            PostPagination(),
+            PostViewSet.queryset.all(),
+            request,
+            lambda posts: (
+                PostSerializer(posts, many=True, context={"request": request}).data
+            ),
+        )
+
+    return await aconditional_response(request, version, None, render)
+
+
+@api_view(login_required=False)
+async def recent_posts(request):
+    version = await aposts_version()
+
+    async def render():
+        # Shares the cached rendering with PostViewSet.recent.
+        key = recent_posts_key(request, version)
+        data = await cache.aget(key)
+        if data is None:
+            posts = [post async for post in PostViewSet.queryset.all()[:6]]
+            serializer = PostSerializer(posts, many=True, context={"request": request})
+            data = serializer.data
+            await cache.aset(key, data, RECENT_POSTS_TIMEOUT)
+        return JsonResponse(data, safe=False)
+
+    return await aconditional_response(request, version, None, render)
@@ -0,0 +1,244 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Subquery, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Attraction, BudgetLine, Column, VisitedAttraction
+
+CENTS = Decimal("0.01")
+
+
+def refresh_budget(*column_ids):
+    """
+    Rebuild the BudgetLine rows of the given columns from their cards and
+    visits: one grouped query for each, whatever the size of the trip. For
+    bulk writes, which send no signals; single saves adjust the lines.
+    """
+    column_ids = {pk for pk in column_ids if pk is not None}
+    if not column_ids:
+        return
+
+    with transaction.atomic():
+        # Lock the columns so concurrent refreshes of a day take turns.
+        list(
+            Column.objects.select_for_update()
+            .filter(id__in=column_ids)
+            .order_by("id")
+            .values_list("id")
+        )
+        BudgetLine.objects.filter(column_id__in=column_ids).delete()
+        BudgetLine.objects.bulk_create(
+            BudgetLine(**line) for line in budget_lines(column_ids)
+        )
+
+
+def budget_lines(column_ids):
+    """
+    Field values of the BudgetLine rows of the given columns.
+    """
+    lines = {}
+    planned = (
+        Attraction.objects.filter(column_id__in=column_ids)
+        .values("column_id", "category")
+        .annotate(planned=Sum("cost"), cards=Count("id"))
+        .order_by()
+    )
+    for row in planned:
+        lines[row["column_id"], row["category"]] = {
+            "column_id_id": row["column_id"],
+            "category": row["category"],
+            "planned": row["planned"],
+            "cards": row["cards"],
+        }
+
+    actual = (
+        VisitedAttraction.objects.filter(attraction_id__column_id__in=column_ids)
+        .values("attraction_id__column_id", "attraction_id__category")
+        .annotate(actual=Sum("actualCost"))
+        .order_by()
+    )
+    for row in actual:
+        key = row["attraction_id__column_id"], row["attraction_id__category"]
+        lines[key]["actual"] = row["actual"]
+    return lines.values()
+
+
+def trip_budget(trip):
+    """
+    Planned and actual totals of `trip`, per day (column) and per category,
+    read from the summary table with a single query.
+    """
+    rows = (
+        Column.objects.filter(trip_id=trip)
+        .order_by("position", "id")
+        .values(
+            "id",
+            "title",
+            "budget_lines__category",
+            "budget_lines__planned",
+            "budget_lines__actual",
+            "budget_lines__cards",
+        )
+    )
+
+    zero = {"planned": Decimal(0), "actual": Decimal(0), "cards": 0}
+    days = {}
+    categories = {
+        value: {"category": value, "label": label, **zero}
+        for value, label in Attraction.CATEGORY_CHOICES
+    }
+    total = dict(zero)
+    for row in rows:
+        day = days.setdefault(
+            row["id"], {"column_id": row["id"], "title": row["title"], **zero}
+        )
+        if row["budget_lines__category"] is None:
+            continue  # a day without cards
+        for totals in (day, categories[row["budget_lines__category"]], total):
+            totals["planned"] += row["budget_lines__planned"]
+            totals["actual"] += row["budget_lines__actual"]
+            totals["cards"] += row["budget_lines__cards"]
+
+    return {
+        "trip_id": trip.id,
+        **_money(total),
+        "days": [_money(day) for day in days.values()],
+        "categories": [_money(category) for category in categories.values()],
+    }
+
+
+def _money(totals):
+    # Same "12.50" strings as the cost fields of the other endpoints.
+    return {
+        **totals,
+        "planned": str(totals["planned"].quantize(CENTS)),
+        "actual": str(totals["actual"].quantize(CENTS)),
+    }
+
+
+def adjust_budget(column_id, category, planned=0, cards=0, actual=0):
+    """
+    Add the given amounts to the (column_id, category) line in a single
+    UPDATE. A card added to a day and category without one creates it.
+    """
+    if not (planned or cards or actual):
+        return
+    line = BudgetLine.objects.filter(column_id=column_id, category=category)
+    changes = {
+        "planned": F("planned") + planned,
+        "cards": F("cards") + cards,
+        "actual": F("actual") + actual,
+    }
+    if line.update(**changes) or cards <= 0:
+        return
+    try:
+        with transaction.atomic():
+            BudgetLine.objects.create(
+                column_id_id=column_id,
+                category=category,
+                planned=planned,
+                cards=cards,
+                actual=actual,
+            )
+    except IntegrityError:
+        # Created meanwhile by a concurrent save.
+        line.update(**changes)
+
+
+def adjust_actual(attraction_id, amount):
+    """
+    Add `amount` to the actual spend on the line of card `attraction_id`.
+    """
+    if not amount:
+        return
+    card = Attraction.objects.filter(pk=attraction_id)
+    BudgetLine.objects.filter(
+        column_id=Subquery(card.values("column_id")),
+        category=Subquery(card.values("category")),
+    ).update(actual=F("actual") + amount)
+
+
+def card_actual(attraction_id):
+    return VisitedAttraction.objects.filter(attraction_id=attraction_id).aggregate(
+        actual=Sum("actualCost", default=Decimal(0))
+    )["actual"]
+
+
+def _amount(value):
+    # Costs are assigned as given (int, str or Decimal) until reloaded.
+    return None if value is None else Decimal(str(value))
+
+
+def _deleted_on_its_own(sender, origin):
+    # A column or trip delete takes the budget lines with it, and visits
+    # deleted along with their card are covered by the card.
+    return isinstance(origin, sender) or getattr(origin, "model", None) is sender
+
+
+@receiver(post_save, sender=Attraction)
+def attraction_saved(sender, instance, created, **kwargs):
+    # The _loaded_* attributes still hold the card as it was loaded.
+    line = instance.column_id_id, instance.category
+    cost = _amount(instance.cost)
+    if created:
+        adjust_budget(*line, planned=cost, cards=1)
+        return
+
+    loaded_line = (
+        getattr(instance, "_loaded_column_id", None),
+        getattr(instance, "_loaded_category", None),
+    )
+    loaded_cost = _amount(getattr(instance, "_loaded_cost", None))
+    if None in loaded_line or loaded_cost is None:
+        # Saved without being loaded whole: nothing to compare against.
+        refresh_budget(instance.column_id_id, loaded_line[0])
+    elif loaded_line == line:
+        adjust_budget(*line, planned=cost - loaded_cost)
+    else:
+        # The spend on the card's visits moves along with it.
+        actual = card_actual(instance.pk)
+        adjust_budget(*loaded_line, planned=-loaded_cost, cards=-1, actual=-actual)
+        adjust_budget(*line, planned=cost, cards=1, actual=actual)
+
+
+@receiver(post_save, sender=VisitedAttraction)
+def visit_saved(sender, instance, created, **kwargs):
+    cost = _amount(instance.actualCost)
+    if created:
+        adjust_actual(instance.attraction_id_id, cost)
+        return
+
+    loaded_id = getattr(instance, "_loaded_attraction_id", None)
+    loaded_cost = _amount(getattr(instance, "_loaded_actual_cost", None))
+    if loaded_id is None or loaded_cost is None:
+        refresh_budget(
+            *Attraction.objects.filter(
+                pk__in={instance.attraction_id_id, loaded_id} - {None}
+            ).values_list("column_id", flat=True)
+        )
+    elif loaded_id == instance.attraction_id_id:
+        adjust_actual(loaded_id, cost - loaded_cost)
+    else:
+        adjust_actual(loaded_id, -loaded_cost)
+        adjust_actual(instance.attraction_id_id, cost)
+
+
+@receiver(pre_delete, sender=Attraction)
+def attraction_deleted(sender, instance, origin=None, **kwargs):
+    # Before the delete, while the card's visits can still be summed.
+    if _deleted_on_its_own(sender, origin):
+        adjust_budget(
+            instance.column_id_id,
+            instance.category,
+            planned=-_amount(instance.cost),
+            cards=-1,
+            actual=-card_actual(instance.pk),
+        )
+
+
+@receiver(post_delete, sender=VisitedAttraction)
+def visit_deleted(sender, instance, origin=None, **kwargs):
+    if _deleted_on_its_own(sender, origin):
+        adjust_actual(instance.attraction_id_id, -_amount(instance.actualCost))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.cache import cache
+
+# Seconds the rendered recent-posts feed is served from the cache. Saving or
+# deleting a post invalidates it right away; this only bounds staleness
+# from writes that bypass the model (queryset.update() in a shell).
+RECENT_POSTS_TIMEOUT = 300
+
+POSTS_VERSION = "posts:version"
+
+
+def posts_version():
+    """
+    Version of the post listings: moved on by invalidate_recent_posts()
+    whenever a post is saved or deleted, and read without a query. Used
+    for the ETag of the lists and in the key of the cached recent feed.
+
+    Every worker must read the same version, so deployments with more than
+    one need the shared cache (REDIS_URL, checked by app.W001). The expiry
+    only bounds the damage when that is missing.
+    """
+    return cache.get_or_set(POSTS_VERSION, time.time_ns, RECENT_POSTS_TIMEOUT)
+
+
+async def aposts_version():
+    return await cache.aget_or_set(POSTS_VERSION, time.time_ns, RECENT_POSTS_TIMEOUT)
+
+
+def recent_posts_key(request, version):
+    """
+    Cache key of the recent feed as rendered for `request` at posts
+    `version`. The payload holds absolute URLs, so the scheme and host are
+    part of the key.
+    """
+    return f"posts:recent:{version}:{request.scheme}://{request.get_host()}"
+
+
+def invalidate_recent_posts():
+    """
+    Drop every cached rendering of the recent feed, whatever the host, and
+    change the ETag of the post lists, by moving to a new version.
+    """
+    try:
+        cache.incr(POSTS_VERSION)
+    except ValueError:
+        # The version expired: start from a value never used before.
+        cache.set(POSTS_VERSION, time.time_ns(), RECENT_POSTS_TIMEOUT)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register(deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    The recent posts feed and the post listing ETags live in the default
+    cache, so worker processes must share it (see REDIS_URL).
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if backend.endswith(("LocMemCache", "DummyCache")):
+        return [
+            Warning(
+                "The default cache is local to each process.",
+                hint=(
+                    "Set REDIS_URL when running more than one worker, or "
+                    "workers serve stale post listings."
+                ),
+                id="app.W001",
+            )
+        ]
+    return []
@@ -0,0 +1,51 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_response(request, version, last_modified, render):
+    """
+    Answer a GET with 304 Not Modified when the client's If-None-Match or
+    If-Modified-Since still matches, without calling `render`.
+    `version` is anything that changes whenever the payload does (cheap to
+    fetch, e.g. an updated_at); `last_modified` is a datetime or None.
+    Otherwise return render() with ETag and Last-Modified set.
+    """
+    etag, timestamp, response = _not_modified(request, version, last_modified)
+    if response is None:
+        response = render()
+    return _validators(response, etag, timestamp)
+
+
+async def aconditional_response(request, version, last_modified, render):
+    """
+    conditional_response() for async views: `render` is awaited.
+    """
+    etag, timestamp, response = _not_modified(request, version, last_modified)
+    if response is None:
+        response = await render()
+    return _validators(response, etag, timestamp)
+
+
+def _not_modified(request, version, last_modified):
+    # The same version renders differently per URL (cursor, page size)
+    # and per format (JSON or the browsable API). Plain Django views
+    # answer JSON only.
+    renderer = getattr(request, "accepted_renderer", None)
+    format = renderer.format if renderer else "json"
+    key = f"{request.get_full_path()}:{format}:{version}"
+    etag = quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    return etag, timestamp, response
+
+
+def _validators(response, etag, timestamp):
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response.headers["ETag"] = etag
+        if timestamp is not None:
+            response.headers["Last-Modified"] = http_date(timestamp)
+    # Let clients keep the body but check back on every poll.
+    patch_cache_control(response, no_cache=True)
+    return response
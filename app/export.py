@@ -0,0 +1,69 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Attraction, Column, VisitedAttraction, positions_are_gapped
+from .ordering import with_rank
+from .serializers import TripSerializer
+
+# Rows fetched per round-trip while streaming; memory stays flat whatever
+# the size of the trip.
+EXPORT_CHUNK_SIZE = 500
+
+COLUMN_FIELDS = ["id", "title", "position"]
+ATTRACTION_FIELDS = [
+    "id",
+    "column_id",
+    "title",
+    "location",
+    "category",
+    "mapUrl",
+    "ticket",
+    "cost",
+    "visited",
+    "position",
+]
+VISIT_FIELDS = [
+    "id",
+    "attraction_id",
+    "rating",
+    "images",
+    "moment",
+    "reviewed_at",
+    "actualCost",
+]
+
+
+def export_trip(trip):
+    """
+    Yield the whole trip board as NDJSON: the trip, then its columns,
+    attractions and visits, one {"type": ..., "data": ...} object per line.
+    """
+    yield _line("trip", TripSerializer(trip).data)
+
+    columns = Column.objects.filter(trip_id=trip).order_by("position", "id")
+    attractions = Attraction.objects.filter(trip_id=trip).order_by(
+        "column_id", "position", "id"
+    )
+    visits = VisitedAttraction.objects.filter(trip_id=trip).order_by("id")
+    column_fields, attraction_fields = COLUMN_FIELDS, ATTRACTION_FIELDS
+    if positions_are_gapped():
+        # Export the dense positions clients see, not the sparse keys.
+        columns = with_rank(columns, "trip_id")
+        attractions = with_rank(attractions, "column_id")
+        column_fields = [*COLUMN_FIELDS, "rank"]
+        attraction_fields = [*ATTRACTION_FIELDS, "rank"]
+
+    for kind, queryset, fields in (
+        ("column", columns, column_fields),
+        ("attraction", attractions, attraction_fields),
+        ("visit", visits, VISIT_FIELDS),
+    ):
+        for row in queryset.values(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            if "rank" in row:
+                row["position"] = row.pop("rank")
+            yield _line(kind, row)
+
+
+def _line(kind, data):
+    return json.dumps({"type": kind, "data": data}, cls=DjangoJSONEncoder) + "\n"
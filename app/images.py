@@ -0,0 +1,164 @@
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Widths (px) of the renditions generated for every post picture.
+RENDITION_WIDTHS = (320, 640, 1280)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# Visit photos: longest side of the display image, side of the square thumbnail.
+PHOTO_MAX_SIZE = 1600
+THUMBNAIL_SIZE = 320
+
+_executor = None
+_processes = None
+
+
+def enqueue(func, *args):
+    """
+    Run func(*args) on the image worker pool once the current transaction
+    commits, so uploads return without waiting for Pillow.
+    With IMAGE_WORKERS = 0 the work runs inline instead (tests, dev).
+    """
+    if settings.IMAGE_WORKERS == 0:
+        transaction.on_commit(lambda: func(*args))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run, func, *args))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images"
+        )
+    return _executor
+
+
+def _run(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Image task %s%r failed", func.__name__, args)
+    finally:
+        # Worker threads get their own connections; don't leak them.
+        connections.close_all()
+
+
+def cpu_map(func, items):
+    """
+    Run func(item) for every item on the process pool (PHOTO_PROCESSES
+    workers, so decoding and resizing use every core) and yield
+    (result, exception) pairs in order.
+    With PHOTO_PROCESSES = 0 everything runs in the calling thread.
+    `func` must be a module-level function that does not touch the database.
+    """
+    global _processes
+    if settings.PHOTO_PROCESSES == 0:
+        for item in items:
+            try:
+                yield func(item), None
+            except Exception as e:
+                yield None, e
+        return
+
+    if _processes is None:
+        # Forking a threaded server is unsafe; start clean interpreters.
+        _processes = ProcessPoolExecutor(
+            max_workers=settings.PHOTO_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    futures = [_processes.submit(func, item) for item in items]
+    for future in futures:
+        try:
+            yield future.result(), None
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); start a new pool next time.
+            _processes = None
+            yield None, e
+        except Exception as e:
+            yield None, e
+
+
+def create_renditions(name, folder):
+    """
+    Resize the stored image `name` to each of RENDITION_WIDTHS (never
+    upscaling) as WebP and JPEG files under `folder`, without EXIF data.
+    Returns {"<width>": {"webp": name, "jpeg": name}}.
+    """
+    with default_storage.open(name, "rb") as original:
+        with Image.open(original) as image:
+            # Apply the EXIF orientation before the metadata is dropped.
+            image = ImageOps.exif_transpose(image)
+            image.load()
+
+    widths = [width for width in RENDITION_WIDTHS if width < image.width]
+    widths = widths or [image.width]
+    stem = os.path.splitext(os.path.basename(name))[0]
+
+    renditions = {}
+    for width in widths:
+        resized = image.copy()
+        resized.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        renditions[str(width)] = {
+            ext: default_storage.save(
+                f"{folder}/{stem}-{width}.{ext}",
+                ContentFile(_encode(resized, format, options)),
+            )
+            for ext, (format, options) in RENDITION_FORMATS.items()
+        }
+    return renditions
+
+
+def delete_renditions(renditions):
+    """
+    Delete the files of `renditions`, as returned by create_renditions().
+    """
+    for names in renditions.values():
+        for name in names.values():
+            default_storage.delete(name)
+
+
+def _encode(image, format, options):
+    if format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def render_photo(path):
+    """
+    Decode the visit photo at `path`, fix its orientation and return
+    (width, height, display JPEG bytes, square WebP thumbnail bytes),
+    both without EXIF data. Runs in a worker process.
+    """
+    with Image.open(path) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    display = image.copy()
+    display.thumbnail((PHOTO_MAX_SIZE, PHOTO_MAX_SIZE), Image.Resampling.LANCZOS)
+    thumbnail = ImageOps.fit(
+        image, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.Resampling.LANCZOS
+    )
+    return (
+        display.width,
+        display.height,
+        _encode(display, *RENDITION_FORMATS["jpeg"]),
+        _encode(thumbnail, *RENDITION_FORMATS["webp"]),
+    )
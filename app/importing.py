@@ -0,0 +1,42 @@
+from django.db.models import Max
+
+from .budget import refresh_budget
+from .models import Attraction, Column, position_step
+from .ordering import spread_key
+
+
+def import_board(trip, columns):
+    """
+    Append validated `columns` (dicts with a title and a list of "cards")
+    to the trip board. Positions are assigned in memory and rows are written
+    with one bulk INSERT for the columns and one for the cards (batched by
+    the backend), whatever the size of the document.
+    Must run inside a transaction.
+    Returns the created columns.
+    """
+    last = Column.objects.filter(trip_id=trip).aggregate(Max("position"))[
+        "position__max"
+    ]
+    first = 0 if last is None else last + position_step()
+    created = Column.objects.bulk_create(
+        Column(
+            trip_id=trip,
+            title=column["title"],
+            position=first + index * position_step(),
+        )
+        for index, column in enumerate(columns)
+    )
+
+    Attraction.objects.bulk_create(
+        Attraction(
+            column_id=column,
+            trip_id=trip,
+            owner_id=trip.owner_id,
+            position=spread_key(index),
+            **card,
+        )
+        for column, data in zip(created, columns)
+        for index, card in enumerate(data["cards"])
+    )
+    refresh_budget(*(column.id for column in created))
+    return created
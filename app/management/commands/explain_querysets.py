@@ -0,0 +1,116 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from app.models import Column, Trip
+from app.views import (
+    AttractionViewSet,
+    ColumnViewSet,
+    PostViewSet,
+    TripViewSet,
+    VisitedAttractionViewSet,
+    board_attractions,
+    with_board_version,
+)
+
+# Plan lines that read a whole table: PostgreSQL's "Seq Scan on t" and
+# SQLite's "SCAN t" (as opposed to "SEARCH t USING INDEX ...").
+SEQUENTIAL_SCAN = re.compile(r"Seq Scan on \S+|\bSCAN \w+$")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queryset behind every API list endpoint and flag "
+        "sequential scans. Run it against a seeded database: on small tables "
+        "the planner prefers a sequential scan anyway."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Email of the user to build querysets for "
+            "(defaults to the user with the most trips).",
+        )
+        parser.add_argument(
+            "--fail-on-seq-scan",
+            action="store_true",
+            help="Exit with an error when a sequential scan is found.",
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options["user"])
+        trip = user.trips.first()
+
+        flagged = []
+        for name, queryset in self.querysets(user, trip):
+            plan = queryset.explain()
+            scans = [
+                match.group()
+                for line in plan.splitlines()
+                if (match := SEQUENTIAL_SCAN.search(line.strip()))
+            ]
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"{name}: {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+            if options["verbosity"] > 1:
+                self.stdout.write(plan)
+
+        if flagged and options["fail_on_seq_scan"]:
+            raise CommandError(f"Sequential scans in: {', '.join(flagged)}")
+
+    def get_user(self, email):
+        User = get_user_model()
+        if email:
+            try:
+                return User.objects.get(email=email)
+            except User.DoesNotExist:
+                raise CommandError(f"No user with email {email}")
+
+        user = (
+            User.objects.annotate(trip_count=Count("trips"))
+            .order_by("-trip_count")
+            .first()
+        )
+        if user is None:
+            raise CommandError("The database has no users, seed it first.")
+        return user
+
+    def querysets(self, user, trip):
+        viewsets = [
+            ("trip-list", TripViewSet, {}),
+            ("column-list", ColumnViewSet, {"trip_id": trip.id} if trip else {}),
+            ("attraction-list", AttractionViewSet, {}),
+            ("visited-list", VisitedAttractionViewSet, {}),
+            ("posts-list", PostViewSet, {}),
+        ]
+        for name, viewset, params in viewsets:
+            view = viewset(action="list", kwargs={}, format_kwarg=None)
+            view.request = Request(RequestFactory().get("/", params))
+            view.request.user = user
+            yield name, self.first_page(view, view.filter_queryset(view.get_queryset()))
+
+        if trip:
+            yield (
+                "grouped_attractions-version",
+                with_board_version(Trip.objects.filter(pk=trip.pk)),
+            )
+            columns = Column.objects.filter(trip_id=trip).order_by("id")
+            yield "grouped_attractions-list", board_attractions(columns)
+        yield "posts-recent", PostViewSet.queryset.all()[:6]
+
+    def first_page(self, view, queryset):
+        """
+        The query of the list's first page, as the view's paginator runs it.
+        """
+        paginator = view.paginator
+        if paginator is None:
+            return queryset
+        paginator.ordering = paginator.get_ordering(view.request, queryset, view)
+        page_size = paginator.get_page_size(view.request)
+        return queryset.order_by(*paginator.order_by(reverse=False))[: page_size + 1]
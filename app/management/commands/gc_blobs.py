@@ -0,0 +1,117 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.utils.timezone import now
+
+from app.models import Blob
+from app.storage import BLOB_PREFIX, ContentAddressedStorage, blob_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the references to content-addressed blobs and delete the "
+        "ones nothing has used for the grace period."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Keep unreferenced blobs used more recently than this "
+            "(files saved whose row is not committed yet).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(hours=options["grace_hours"])
+        dry_run = options["dry_run"]
+
+        recounted = self.recount()
+
+        deleted = 0
+        for name in Blob.objects.filter(
+            refcount=0, last_used_at__lt=cutoff
+        ).values_list("name", flat=True):
+            if not dry_run and not self.delete_blob(name, cutoff):
+                continue
+            deleted += 1
+            self.stdout.write(f"Deleted {name}")
+
+        strays = self.stray_files(cutoff.timestamp())
+        for path in strays:
+            if not dry_run:
+                os.remove(path)
+            self.stdout.write(f"Deleted stray file {path}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recounted {recounted} blobs, deleted {deleted} orphaned "
+                f"blobs and {len(strays)} stray files."
+            )
+        )
+
+    def recount(self):
+        """
+        Reset every Blob.refcount to the number of file fields naming it.
+        Fixes drift from replaced files and bulk deletes.
+        """
+        references = Counter()
+        for model in apps.get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, models.FileField) and isinstance(
+                    field.storage, ContentAddressedStorage
+                ):
+                    references.update(
+                        model._default_manager.exclude(**{field.attname: ""})
+                        .exclude(**{f"{field.attname}__isnull": True})
+                        .values_list(field.attname, flat=True)
+                    )
+
+        blobs = list(Blob.objects.only("id", "name", "refcount"))
+        changed = []
+        for blob in blobs:
+            if blob.refcount != references[blob.name]:
+                blob.refcount = references[blob.name]
+                changed.append(blob)
+        Blob.objects.bulk_update(changed, ["refcount"])
+        return len(blobs)
+
+    def delete_blob(self, name, cutoff):
+        # Re-check under the row lock: a concurrent upload may have taken
+        # a reference since the blob was listed.
+        with transaction.atomic():
+            blob = (
+                Blob.objects.select_for_update()
+                .filter(name=name, refcount=0, last_used_at__lt=cutoff)
+                .first()
+            )
+            if blob is None:
+                return False
+            blob.delete()
+            blob_storage.delete_file(name)
+        return True
+
+    def stray_files(self, cutoff):
+        """
+        Old files under the blob directory without a Blob row, such as
+        temporary files left behind by an interrupted upload.
+        """
+        root = blob_storage.path(BLOB_PREFIX)
+        known = set(Blob.objects.values_list("name", flat=True))
+        strays = []
+        for directory, _, files in os.walk(root):
+            for file in files:
+                path = os.path.join(directory, file)
+                name = os.path.relpath(path, blob_storage.location).replace(os.sep, "/")
+                if name not in known and os.path.getmtime(path) < cutoff:
+                    strays.append(path)
+        return strays
@@ -0,0 +1,48 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.importing import import_board
+from app.models import Trip
+from app.serializers import ImportColumnSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Append a board document (a JSON list of columns with their cards, "
+        "as returned by grouped_attractions) to an existing trip."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSON file to import, or - for stdin.")
+        parser.add_argument("--trip", type=int, required=True, help="Trip id.")
+
+    def handle(self, *args, **options):
+        try:
+            if options["path"] == "-":
+                document = json.load(sys.stdin)
+            else:
+                with open(options["path"], encoding="utf-8") as handle:
+                    document = json.load(handle)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+
+        serializer = ImportColumnSerializer(data=document, many=True)
+        if not serializer.is_valid():
+            raise CommandError(f"Invalid board document: {serializer.errors}")
+
+        with transaction.atomic():
+            try:
+                trip = Trip.objects.select_for_update().get(pk=options["trip"])
+            except Trip.DoesNotExist:
+                raise CommandError(f"No trip with id {options['trip']}")
+            columns = import_board(trip, serializer.validated_data)
+
+        cards = sum(len(column["cards"]) for column in serializer.validated_data)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {len(columns)} columns and {cards} cards into {trip}."
+            )
+        )
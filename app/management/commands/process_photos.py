@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.photos import pending_photo_ids, process_photos
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued visit photos on a pool of worker processes. Uploads "
+        "are processed in the web process too; this worker picks up whatever "
+        "is left (restarts, crashed workers) and takes the load off the API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch", type=int, default=50, help="Photos claimed per round."
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=2,
+            help="Seconds to wait between polls of an empty queue.",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            ids = pending_photo_ids(options["batch"])
+            if ids:
+                processed += len(process_photos(ids))
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} photos."))
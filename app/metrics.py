@@ -0,0 +1,223 @@
+"""
+Per-route request metrics: latency, database queries and database time,
+exported in the Prometheus text format on /metrics.
+
+Counts are kept in process memory, so each worker process reports its own;
+scrape every worker (or run one metrics target per process) to see them all.
+"""
+
+import hmac
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Anything else is reported as "other", so clients cannot mint new series.
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# [queries, seconds] of the request being served; copied into the threads
+# sync_to_async runs queries on, so async views are counted too.
+_db_stats = ContextVar("db_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            yield f"{name}_bucket", {**labels, "le": str(bound)}, cumulative
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, route, method, seconds, queries, db_seconds):
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[route, method] = RouteStats()
+            stats.latency.observe(seconds)
+            stats.queries.observe(queries)
+            stats.db_seconds += db_seconds
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def render(self):
+        families = {
+            "planner_http_request_duration_seconds": (
+                "histogram",
+                "Request latency by route and method.",
+                lambda stats, labels: stats.latency.samples(
+                    "planner_http_request_duration_seconds", labels
+                ),
+            ),
+            "planner_db_queries_per_request": (
+                "histogram",
+                "Database queries per request by route and method.",
+                lambda stats, labels: stats.queries.samples(
+                    "planner_db_queries_per_request", labels
+                ),
+            ),
+            "planner_db_query_duration_seconds_total": (
+                "counter",
+                "Time spent in database queries by route and method.",
+                lambda stats, labels: [
+                    (
+                        "planner_db_query_duration_seconds_total",
+                        labels,
+                        stats.db_seconds,
+                    )
+                ],
+            ),
+        }
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines = []
+            for family, (kind, description, samples) in families.items():
+                lines.append(f"# HELP {family} {description}")
+                lines.append(f"# TYPE {family} {kind}")
+                for (route, method), stats in routes:
+                    labels = {"route": route, "method": method}
+                    for name, sample_labels, value in samples(stats, labels):
+                        lines.append(f"{name}{{{_labels(sample_labels)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    def escape(value):
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+registry = Registry()
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _db_stats.get()
+    if stats is None:  # outside a request (commands, startup)
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+def request_db_stats():
+    """
+    (queries, seconds) spent in the database so far by the current request,
+    or None outside one.
+    """
+    stats = _db_stats.get()
+    return None if stats is None else tuple(stats)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install(connection)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, query count and query time of every request, labelled
+    with the resolved view name and the method. Put it first so the latency
+    includes the other middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        # Connections opened before the middleware was loaded.
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, token, started = self.start()
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(request, stats, token, started)
+
+    async def __acall__(self, request):
+        stats, token, started = self.start()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(request, stats, token, started)
+
+    def start(self):
+        stats = [0, 0]
+        return stats, _db_stats.set(stats), time.perf_counter()
+
+    def finish(self, request, stats, token, started):
+        elapsed = time.perf_counter() - started
+        _db_stats.reset(token)
+        match = request.resolver_match
+        route = (match.view_name or match.route) if match else "unmatched"
+        method = request.method if request.method in METHODS else "other"
+        registry.observe(route, method, elapsed, stats[0], stats[1])
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Disabled (404) unless METRICS_TOKEN is set;
+    scrapers send it as a Bearer token.
+    """
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    header = request.headers.get("Authorization", "")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not hmac.compare_digest(header.encode(), expected.encode()):
+        return HttpResponse(status=401, headers={"WWW-Authenticate": "Bearer"})
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
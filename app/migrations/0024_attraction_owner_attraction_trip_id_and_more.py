@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_remove_trip_trip_members_trip_trip_members'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attraction',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attractions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='attraction',
+            name='trip_id',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attractions', to='app.trip'),
+        ),
+        migrations.AddField(
+            model_name='visitedattraction',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visits', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='visitedattraction',
+            name='trip_id',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='visits', to='app.trip'),
+        ),
+    ]
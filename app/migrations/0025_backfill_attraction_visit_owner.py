@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_trip_and_owner(apps, schema_editor):
+    Attraction = apps.get_model("app", "Attraction")
+    Column = apps.get_model("app", "Column")
+    VisitedAttraction = apps.get_model("app", "VisitedAttraction")
+
+    column = Column.objects.filter(pk=OuterRef("column_id"))
+    Attraction.objects.update(
+        trip_id=Subquery(column.values("trip_id")[:1]),
+        owner=Subquery(column.values("trip_id__owner")[:1]),
+    )
+
+    attraction = Attraction.objects.filter(pk=OuterRef("attraction_id"))
+    VisitedAttraction.objects.update(
+        trip_id=Subquery(attraction.values("trip_id")[:1]),
+        owner=Subquery(attraction.values("owner")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_attraction_owner_attraction_trip_id_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_trip_and_owner, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 10:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0025_backfill_attraction_visit_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attraction',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='attractions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='attraction',
+            name='trip_id',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='attractions', to='app.trip'),
+        ),
+        migrations.AlterField(
+            model_name='visitedattraction',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='visits', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='visitedattraction',
+            name='trip_id',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='visits', to='app.trip'),
+        ),
+        migrations.AddIndex(
+            model_name='attraction',
+            index=models.Index(fields=['owner', 'column_id', 'position'], name='attraction_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitedattraction',
+            index=models.Index(fields=['owner', 'attraction_id'], name='visit_owner_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_alter_attraction_owner_alter_attraction_trip_id_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attraction',
+            index=models.Index(fields=['column_id', 'position'], name='attraction_column_pos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at'], name='post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['owner', '-start_date'], name='trip_owner_start_idx'),
+        ),
+    ]
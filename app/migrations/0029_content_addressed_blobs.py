@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:24
+
+import app.storage
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0028_post_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='visitedattraction',
+            name='images',
+            field=models.FileField(blank=True, help_text='Upload images from your visit', null=True, storage=app.storage.get_blob_storage, upload_to='visited_attractions/'),
+        ),
+    ]
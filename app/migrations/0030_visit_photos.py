@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:26
+
+import app.storage
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_content_addressed_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitPhoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original', models.FileField(storage=app.storage.get_blob_storage, upload_to='visit_photos/')),
+                ('image', models.FileField(blank=True, null=True, storage=app.storage.get_blob_storage, upload_to='visit_photos/')),
+                ('thumbnail', models.FileField(blank=True, null=True, storage=app.storage.get_blob_storage, upload_to='visit_photos/')),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('visit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photos', to='app.visitedattraction')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='visit_photo_queue_idx')],
+            },
+        ),
+    ]
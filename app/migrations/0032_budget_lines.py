@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 05:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0031_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BudgetLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('museum', 'Museum'), ('landmark', 'Landmark'), ('park', 'Park'), ('palace', 'Palace'), ('restaurant', 'Restaurant'), ('gallery', 'Gallery'), ('church', 'Church'), ('other', 'Other')], max_length=40)),
+                ('planned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('actual', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cards', models.PositiveIntegerField(default=0)),
+                ('column_id', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budget_lines', to='app.column')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('column_id', 'category'), name='budget_line_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_budget_lines(apps, schema_editor):
+    Attraction = apps.get_model("app", "Attraction")
+    BudgetLine = apps.get_model("app", "BudgetLine")
+    VisitedAttraction = apps.get_model("app", "VisitedAttraction")
+
+    lines = {}
+    planned = (
+        Attraction.objects.values("column_id", "category")
+        .annotate(planned=Sum("cost"), cards=Count("id"))
+        .order_by()
+    )
+    for row in planned:
+        lines[row["column_id"], row["category"]] = BudgetLine(
+            column_id_id=row["column_id"],
+            category=row["category"],
+            planned=row["planned"],
+            cards=row["cards"],
+        )
+
+    actual = (
+        VisitedAttraction.objects.values(
+            "attraction_id__column_id", "attraction_id__category"
+        )
+        .annotate(actual=Sum("actualCost"))
+        .order_by()
+    )
+    for row in actual:
+        key = row["attraction_id__column_id"], row["attraction_id__category"]
+        lines[key].actual = row["actual"]
+
+    BudgetLine.objects.bulk_create(lines.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0032_budget_lines'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_budget_lines, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,32 @@
+import random
+import re
+
+from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.utils.text import slugify
+from django.utils.timezone import now
 from rest_framework.exceptions import ValidationError
 
-from planner import settings
+from .cache import invalidate_recent_posts
+from .images import create_renditions, delete_renditions, enqueue
+from .storage import get_blob_storage
+
+
+def positions_are_gapped():
+    """
+    In "gapped" mode board positions are sparse ordering keys spaced
+    POSITION_GAP apart, so a move only rewrites the card being moved.
+    The default "dense" mode stores positions as 0, 1, 2...
+    """
+    return settings.POSITION_MODE == "gapped"
+
+
+def position_step():
+    return settings.POSITION_GAP if positions_are_gapped() else 1
 
 
 class Trip(models.Model):
@@ -17,9 +39,14 @@ class Trip(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="trips"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-start_date"]
+        indexes = [
+            # TripViewSet: trips of one owner, newest first.
+            models.Index(fields=["owner", "-start_date"], name="trip_owner_start_idx"),
+        ]
         constraints = [
             models.CheckConstraint(
                 condition=Q(start_date__lte=F("end_date")),
@@ -30,6 +57,23 @@ class Trip(models.Model):
     def __str__(self) -> str:
         return f"{self.destination} - {self.owner.email}"
 
+    def save(self, *args, **kwargs):
+        transferred = self.pk is not None and self.owner_id != getattr(
+            self, "_loaded_owner_id", self.owner_id
+        )
+        super().save(*args, **kwargs)
+        if transferred:
+            # Keep the owner copied onto the trip's cards and visits in step.
+            Attraction.objects.filter(trip_id=self).update(owner=self.owner_id)
+            VisitedAttraction.objects.filter(trip_id=self).update(owner=self.owner_id)
+        self._loaded_owner_id = self.owner_id
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_owner_id = instance.__dict__.get("owner_id")
+        return instance
+
     def clean(self):
         super().clean()
         if self.start_date and self.end_date and self.start_date > self.end_date:
@@ -44,6 +88,7 @@ class Column(models.Model):
     trip_id = models.ForeignKey(Trip, on_delete=models.CASCADE, related_name="columns")
     title = models.CharField(max_length=100, default="Day")
     position = models.PositiveBigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("trip_id", "position")
@@ -52,6 +97,35 @@ class Column(models.Model):
     def __str__(self) -> str:
         return f"{self.title} - {self.trip_id.destination}"
 
+    def save(self, *args, **kwargs):
+        loaded_trip_id = getattr(self, "_loaded_trip_id", None)
+        if loaded_trip_id is None or loaded_trip_id == self.trip_id_id:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.copy_trip_to_cards()
+        self._loaded_trip_id = self.trip_id_id
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_trip_id = instance.__dict__.get("trip_id_id")
+        return instance
+
+    def copy_trip_to_cards(self):
+        """
+        Moved to another trip: update the trip and owner copied onto the
+        column's cards and their visits.
+        """
+        trip_id, owner_id = self.trip_id_id, self.trip_id.owner_id
+        Attraction.objects.filter(column_id=self).update(
+            trip_id=trip_id, owner=owner_id
+        )
+        VisitedAttraction.objects.filter(attraction_id__column_id=self).update(
+            trip_id=trip_id, owner=owner_id
+        )
+
 
 # A user can add Attraction to a column on the trip-board
 class Attraction(models.Model):
@@ -78,9 +152,30 @@ class Attraction(models.Model):
     cost = models.DecimalField(max_digits=6, decimal_places=2)
     visited = models.BooleanField(default=False)
     position = models.PositiveIntegerField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Copied from the column's trip so ownership filters stay on this table.
+    trip_id = models.ForeignKey(
+        Trip, on_delete=models.CASCADE, related_name="attractions", editable=False
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="attractions",
+        editable=False,
+    )
 
     class Meta:
         ordering = ["column_id", "position"]
+        indexes = [
+            models.Index(
+                fields=["owner", "column_id", "position"],
+                name="attraction_owner_idx",
+            ),
+            # Board, move and reorder: the cards of one column in order.
+            models.Index(
+                fields=["column_id", "position"], name="attraction_column_pos_idx"
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.title} - {self.column_id.trip_id.destination}"
@@ -90,9 +185,53 @@ class Attraction(models.Model):
             max_pos = Attraction.objects.filter(column_id=self.column_id).aggregate(
                 models.Max("position")
             )["position__max"]
-            self.position = 0 if max_pos is None else max_pos + 1
+            self.position = 0 if max_pos is None else max_pos + position_step()
+
+        loaded_trip_id = getattr(self, "_loaded_trip_id", None)
+        if self.pk is None or self.column_id_id != getattr(
+            self, "_loaded_column_id", None
+        ):
+            self.copy_trip_from_column()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "trip_id", "owner"}
         super().save(*args, **kwargs)
 
+        if loaded_trip_id is not None and loaded_trip_id != self.trip_id_id:
+            # Moved to another trip: the visits follow the card.
+            VisitedAttraction.objects.filter(attraction_id=self).update(
+                trip_id=self.trip_id_id, owner=self.owner_id
+            )
+        self._loaded_column_id = self.column_id_id
+        self._loaded_trip_id = self.trip_id_id
+        self._loaded_category = self.category
+        self._loaded_cost = self.cost
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_column_id = instance.__dict__.get("column_id_id")
+        instance._loaded_trip_id = instance.__dict__.get("trip_id_id")
+        # Compared by app.budget to tell which summary lines a save changes.
+        instance._loaded_category = instance.__dict__.get("category")
+        instance._loaded_cost = instance.__dict__.get("cost")
+        return instance
+
+    def copy_trip_from_column(self):
+        """
+        Set the denormalized trip and owner from the column, without a query
+        when the column was loaded together with its trip.
+        """
+        column = Attraction.column_id.field
+        if column.is_cached(self) and Column.trip_id.field.is_cached(self.column_id):
+            trip = self.column_id.trip_id
+            self.trip_id_id, self.owner_id = trip.id, trip.owner_id
+        else:
+            self.trip_id_id, self.owner_id = (
+                Column.objects.filter(pk=self.column_id_id)
+                .values_list("trip_id", "trip_id__owner")
+                .get()
+            )
+
     def clean(self):
         if self.cost < 0:
             raise ValidationError("Cost cannot be negative")
@@ -105,6 +244,7 @@ class VisitedAttraction(models.Model):
     )
     images = models.FileField(
         upload_to="visited_attractions/",
+        storage=get_blob_storage,
         null=True,
         blank=True,
         help_text="Upload images from your visit",
@@ -114,10 +254,188 @@ class VisitedAttraction(models.Model):
     )  # experience description, a funny,silly,awkward moment to remember
     reviewed_at = models.DateTimeField()
     actualCost = models.DecimalField(max_digits=6, decimal_places=2)
+    # Copied from the attraction so ownership filters stay on this table.
+    trip_id = models.ForeignKey(
+        Trip, on_delete=models.CASCADE, related_name="visits", editable=False
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="visits",
+        editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "attraction_id"], name="visit_owner_idx"),
+        ]
 
     def __str__(self):
         return f"Visited: {self.attraction_id.title}"
 
+    def save(self, *args, **kwargs):
+        if self.pk is None or self.attraction_id_id != getattr(
+            self, "_loaded_attraction_id", None
+        ):
+            self.copy_trip_from_attraction()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "trip_id", "owner"}
+        # An image uploaded now takes its own reference on the blob, even
+        # when its content (and so its name) is the same as before.
+        uploaded = bool(self.images) and not self.images._committed
+        super().save(*args, **kwargs)
+        self._loaded_attraction_id = self.attraction_id_id
+        self._loaded_actual_cost = self.actualCost
+
+        # A replaced image drops its reference on the shared blob.
+        replaced = getattr(self, "_loaded_images", None)
+        if replaced and (uploaded or replaced != self.images.name):
+            self.images.storage.delete(replaced)
+        self._loaded_images = self.images.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_attraction_id = instance.__dict__.get("attraction_id_id")
+        instance._loaded_actual_cost = instance.__dict__.get("actualCost")
+        if "images" in field_names:
+            instance._loaded_images = instance.images.name
+        return instance
+
+    def copy_trip_from_attraction(self):
+        """
+        Set the denormalized trip and owner from the attraction.
+        """
+        if VisitedAttraction.attraction_id.field.is_cached(self):
+            attraction = self.attraction_id
+            self.trip_id_id, self.owner_id = attraction.trip_id_id, attraction.owner_id
+        else:
+            self.trip_id_id, self.owner_id = (
+                Attraction.objects.filter(pk=self.attraction_id_id)
+                .values_list("trip_id", "owner")
+                .get()
+            )
+
+
+# How many times Post.save picks a new slug after losing a race for one.
+SLUG_ATTEMPTS = 5
+
+
+class Blob(models.Model):
+    """
+    A file kept once in the content-addressed storage (see app.storage),
+    with the number of fields and uploads referencing it.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return self.name
+
+
+class Upload(models.Model):
+    """
+    A file uploaded on its own through /api/upload/. Holds the reference on
+    its blob until the owner deletes it.
+    """
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="uploads"
+    )
+    file = models.FileField(upload_to="uploads/", storage=get_blob_storage)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.file.name
+
+
+class BudgetLine(models.Model):
+    """
+    Planned (card cost) and actual (visit cost) spend of one category on one
+    day of a trip. Kept up to date by app.budget as cards and visits change,
+    so a trip's budget is read without touching its cards.
+    """
+
+    column_id = models.ForeignKey(
+        Column, on_delete=models.CASCADE, related_name="budget_lines"
+    )
+    category = models.CharField(max_length=40, choices=Attraction.CATEGORY_CHOICES)
+    planned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    actual = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cards = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["column_id", "category"], name="budget_line_unique"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.category} on {self.column_id_id}"
+
+
+class VisitPhoto(models.Model):
+    """
+    One photo of a visit's album. The upload is stored as is and queued as
+    PENDING; app.photos turns it into a display image and a thumbnail.
+    """
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (READY, "Ready"),
+        (FAILED, "Failed"),
+    ]
+
+    visit = models.ForeignKey(
+        VisitedAttraction, on_delete=models.CASCADE, related_name="photos"
+    )
+    original = models.FileField(upload_to="visit_photos/", storage=get_blob_storage)
+    image = models.FileField(
+        upload_to="visit_photos/", storage=get_blob_storage, null=True, blank=True
+    )
+    thumbnail = models.FileField(
+        upload_to="visit_photos/", storage=get_blob_storage, null=True, blank=True
+    )
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When a worker claimed the photo; stale claims are queued again.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # The worker's "next pending photos" query.
+            models.Index(fields=["status", "id"], name="visit_photo_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"Photo {self.pk} of {self.visit_id}"
+
+
+@receiver(post_delete, sender=VisitedAttraction)
+@receiver(post_delete, sender=VisitPhoto)
+@receiver(post_delete, sender=Upload)
+def release_blobs(sender, instance, **kwargs):
+    """
+    Drop the references a deleted row held on content-addressed files.
+    """
+    for field in sender._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            file = getattr(instance, field.name)
+            if file:
+                file.storage.delete(file.name)
+
 
 class Post(models.Model):
     author = models.ForeignKey(
@@ -128,21 +446,122 @@ class Post(models.Model):
     slug = models.SlugField(unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
     picture = models.ImageField(upload_to="posts/", null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Resized copies of `picture`, filled in by the image workers:
+    # {"<width>": {"webp": name, "jpeg": name}}
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Post list and the recent feed.
+            models.Index(fields=["-created_at"], name="post_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.title)
-            unique_slug = self.slug
-            counter = 1
-            while Post.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{self.slug}{counter}"
-                counter += 1
-            self.slug = unique_slug
+        if "picture" in self.get_deferred_fields():
+            picture_changed = False
+        else:
+            picture_changed = (self.picture.name or "") != getattr(
+                self, "_loaded_picture", ""
+            )
+        if picture_changed:
+            # Read from the row: the image workers may have filled them in
+            # since this instance was loaded.
+            replaced = (
+                Post.objects.filter(pk=self.pk)
+                .values_list("renditions", flat=True)
+                .first()
+                if self.pk
+                else None
+            )
+            self.renditions = {}
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "renditions"}
 
-        super().save(*args, **kwargs)
+        self.save_with_unique_slug(*args, **kwargs)
+
+        if picture_changed:
+            self._loaded_picture = self.picture.name or ""
+            if replaced:
+                enqueue(delete_renditions, replaced)
+            if self.picture:
+                enqueue(Post.render_picture, self.pk, self.picture.name)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "picture" in field_names:
+            instance._loaded_picture = instance.picture.name or ""
+        return instance
+
+    def save_with_unique_slug(self, *args, **kwargs):
+        if self.slug:
+            super().save(*args, **kwargs)
+            return
+
+        # Another post may grab the same slug between the lookup and the
+        # INSERT; the unique index rejects it and we pick the next one. The
+        # losers of a race would all pick the same one again, so each retry
+        # skips a random number of suffixes, in a range doubling each time.
+        base = slugify(self.title)
+        for attempt in range(SLUG_ATTEMPTS):
+            self.slug = self.next_free_slug(base, skip=random.randrange(2**attempt))
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                taken = Post.objects.filter(slug=self.slug).exists()
+                if not taken or attempt == SLUG_ATTEMPTS - 1:
+                    self.slug = None
+                    raise
+
+    @staticmethod
+    def render_picture(pk, name):
+        """
+        Build the renditions of picture `name` and store them on the post,
+        unless the picture was replaced in the meantime.
+        """
+        renditions = create_renditions(name, "posts/renditions")
+        updated = Post.objects.filter(pk=pk, picture=name).update(
+            renditions=renditions, updated_at=now()
+        )
+        if updated:
+            invalidate_recent_posts()
+        else:
+            # Replaced or deleted while rendering: nothing refers to them.
+            delete_renditions(renditions)
+
+    @staticmethod
+    def next_free_slug(base, skip=0):
+        """
+        'my-trip' if it is free, otherwise 'my-trip<n>' with n one past the
+        highest suffix in use (plus `skip`), found with a single query.
+        """
+        taken = Post.objects.filter(
+            slug__startswith=base, slug__regex=rf"^{re.escape(base)}[0-9]*$"
+        ).values_list("slug", flat=True)
+        suffixes = [slug[len(base) :] for slug in taken]
+        if "" not in suffixes and not skip:
+            return base
+        highest = max((int(suffix or 0) for suffix in suffixes), default=0)
+        return f"{base}{highest + 1 + skip}"
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    if instance.renditions:
+        enqueue(delete_renditions, instance.renditions)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, **kwargs):
+    # Once now for this process, and again at commit so a feed rendered
+    # from the old rows in between is not kept.
+    invalidate_recent_posts()
+    transaction.on_commit(invalidate_recent_posts)
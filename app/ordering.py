@@ -0,0 +1,326 @@
+from django.db import connection
+from django.db.models import (
+    F,
+    Func,
+    IntegerField,
+    Max,
+    OuterRef,
+    Q,
+    Subquery,
+    Window,
+)
+from django.db.models.functions import RowNumber
+from django.utils.timezone import now
+
+from .budget import refresh_budget
+from .models import (
+    Attraction,
+    Column,
+    VisitedAttraction,
+    position_step,
+    positions_are_gapped,
+)
+
+
+def reorder_column(column_id):
+    """
+    Renumber the attractions of a column so positions are strictly 0, 1, 2, 3...
+    (gap, 2 * gap, 3 * gap... in gapped mode).
+    Runs as a single window-function UPDATE on PostgreSQL; other backends
+    compute the new positions in Python and write them with one bulk_update.
+    """
+    if connection.vendor == "postgresql":
+        _reorder_column_in_db(column_id)
+        return
+
+    attractions = (
+        Attraction.objects.filter(column_id_id=column_id)
+        .order_by("position", "id")
+        .only("id", "position")
+    )
+    changed = []
+    for index, attraction in enumerate(attractions):
+        if attraction.position != spread_key(index):
+            attraction.position = spread_key(index)
+            changed.append(attraction)
+    Attraction.objects.bulk_update(changed, ["position"])
+
+
+def spread_key(index):
+    """
+    Stored position for the row at `index` after renumbering. Gapped keys
+    start one gap in, so there is still room in front of the first row.
+    """
+    if positions_are_gapped():
+        return (index + 1) * position_step()
+    return index
+
+
+def _reorder_column_in_db(column_id):
+    qn = connection.ops.quote_name
+    table = qn(Attraction._meta.db_table)
+    column = qn(Attraction._meta.get_field("column_id").column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {table} AS a
+            SET position = ranked.new_position
+            FROM (
+                SELECT id, (ROW_NUMBER() OVER (ORDER BY position, id) - %s) * %s
+                    AS new_position
+                FROM {table}
+                WHERE {column} = %s
+            ) AS ranked
+            WHERE a.id = ranked.id
+              AND a.position IS DISTINCT FROM ranked.new_position
+            """,
+            [0 if positions_are_gapped() else 1, position_step(), column_id],
+        )
+
+
+def move_attraction(attraction, column_id, position):
+    """
+    Move an attraction to `position` (0-based index) in `column_id`.
+    Must run inside a transaction.
+    """
+    if positions_are_gapped():
+        _move_gapped(attraction, column_id, position)
+    else:
+        _move_dense(attraction, column_id, position)
+
+
+def _move_dense(attraction, new_col_id, new_pos):
+    old_col_id = attraction.column_id_id
+    old_pos = attraction.position
+
+    # Moving within the SAME column
+    if str(old_col_id) == str(new_col_id):
+        if new_pos > old_pos:
+            Attraction.objects.filter(
+                column_id_id=new_col_id,
+                position__gt=old_pos,
+                position__lte=new_pos,
+            ).update(position=F("position") - 1)
+
+        elif new_pos < old_pos:
+            Attraction.objects.filter(
+                column_id_id=new_col_id,
+                position__gte=new_pos,
+                position__lt=old_pos,
+            ).update(position=F("position") + 1)
+
+        # Update the item itself
+        attraction.position = new_pos
+        attraction.save()
+
+    # Moving to a DIFFERENT column
+    else:
+        Attraction.objects.filter(
+            column_id_id=new_col_id, position__gte=new_pos
+        ).update(position=F("position") + 1)
+
+        attraction.column_id_id = new_col_id
+        attraction.position = new_pos
+        attraction.save()
+
+        reorder_column(old_col_id)
+
+
+def _move_gapped(attraction, new_col_id, new_pos):
+    # Only the moved row is written, unless the target column ran out of
+    # room between the two neighbours and has to be spread out again.
+    attraction.position = attraction_position(new_col_id, new_pos, exclude=attraction)
+    attraction.column_id_id = new_col_id
+    attraction.save()
+
+
+def attraction_position(column_id, position, exclude=None):
+    """
+    Stored key that places an attraction at `position` (0-based index)
+    of column `column_id` in gapped mode, leaving out `exclude` (the card
+    being moved). Must run inside a transaction.
+    """
+    siblings = Attraction.objects.filter(column_id_id=column_id)
+    if exclude is not None:
+        siblings = siblings.exclude(pk=exclude.pk)
+    key = key_at(siblings, position)
+    if key is None:
+        reorder_column(column_id)
+        key = key_at(siblings, position)
+    return key
+
+
+def bulk_move_attractions(moves):
+    """
+    Apply a batch of moves (dicts with id, column_id and position) in order,
+    as if each was a single move, and write the result with one bulk_update.
+    Returns the ids of the columns that were touched.
+    Must run inside a transaction.
+    """
+    ids = {move["id"] for move in moves}
+    source_ids = Attraction.objects.filter(id__in=ids).values("column_id")
+    target_ids = [move["column_id"] for move in moves]
+    attractions = (
+        Attraction.objects.select_for_update()
+        .filter(Q(column_id__in=source_ids) | Q(column_id__in=target_ids))
+        .order_by("position", "id")
+        .only("id", "column_id", "position", "trip_id")
+    )
+    trips = dict(
+        Column.objects.filter(Q(id__in=source_ids) | Q(id__in=target_ids)).values_list(
+            "id", "trip_id"
+        )
+    )
+
+    by_id = {}
+    changed_trip = set()
+    board = {column_id: [] for column_id in target_ids}
+    for attraction in attractions:
+        by_id[attraction.id] = attraction
+        board.setdefault(attraction.column_id_id, []).append(attraction)
+
+    for move in moves:
+        attraction = by_id[move["id"]]
+        board[attraction.column_id_id].remove(attraction)
+        attraction.column_id_id = move["column_id"]
+        if attraction.trip_id_id != trips[move["column_id"]]:
+            attraction.trip_id_id = trips[move["column_id"]]
+            changed_trip.add(attraction.id)
+        board[move["column_id"]].insert(move["position"], attraction)
+
+    changed = []
+    moved_at = now()
+    for column_id, cards in board.items():
+        for index, attraction in enumerate(cards):
+            if attraction.position != spread_key(index) or attraction.id in ids:
+                attraction.position = spread_key(index)
+                # bulk_update() skips auto_now; the board ETag relies on it.
+                attraction.updated_at = moved_at
+                changed.append(attraction)
+    Attraction.objects.bulk_update(
+        changed, ["column_id", "trip_id", "position", "updated_at"]
+    )
+    refresh_budget(*board)
+
+    if changed_trip:
+        # Visits follow cards that were dragged onto another trip's board.
+        VisitedAttraction.objects.filter(attraction_id__in=changed_trip).update(
+            trip_id=Subquery(
+                Attraction.objects.filter(pk=OuterRef("attraction_id")).values(
+                    "trip_id"
+                )
+            )
+        )
+    return list(board)
+
+
+def column_position(trip_id, position, exclude=None):
+    """
+    Stored key that places a column at `position` (0-based index) of the
+    trip board in gapped mode, leaving out `exclude` (the column being
+    moved). Must run inside a transaction.
+    """
+    siblings = Column.objects.filter(trip_id_id=trip_id)
+    if exclude is not None:
+        siblings = siblings.exclude(pk=exclude.pk)
+    key = key_at(siblings, position)
+    if key is None:
+        _spread_columns(trip_id)
+        key = key_at(siblings, position)
+    return key
+
+
+def _spread_columns(trip_id):
+    # (trip_id, position) is unique and checked row by row, so move every
+    # column out of the way first and then write the final keys.
+    columns = list(Column.objects.filter(trip_id_id=trip_id).order_by("position"))
+    offset = max(columns[-1].position, spread_key(len(columns))) + 1
+    Column.objects.filter(trip_id_id=trip_id).update(position=F("position") + offset)
+    for index, column in enumerate(columns):
+        column.position = spread_key(index)
+    Column.objects.bulk_update(columns, ["position"])
+
+
+def key_at(siblings, position):
+    """
+    Free key that puts a row at `position` (0-based index) among `siblings`,
+    or None when the neighbouring keys leave no room.
+    """
+    keys = siblings.order_by("position", "id").values_list("position", flat=True)
+    if position <= 0:
+        return key_between(None, keys.first())
+
+    neighbours = list(keys[position - 1 : position + 1])
+    if not neighbours:
+        # Past the end of the list: append.
+        return key_between(siblings.aggregate(Max("position"))["position__max"], None)
+    return key_between(neighbours[0], neighbours[1] if len(neighbours) > 1 else None)
+
+
+def key_between(before, after):
+    step = position_step()
+    if after is None:
+        return 0 if before is None else before + step
+    if before is None and after >= step:
+        return after - step
+
+    low = -1 if before is None else before
+    if after - low < 2:
+        return None
+    return (low + after) // 2
+
+
+def with_rank(queryset, partition):
+    """
+    Annotate each row with its dense 0-based index (`rank`) within `partition`.
+    """
+    return queryset.annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=F(partition),
+            order_by=[F("position").asc(), F("id").asc()],
+        )
+        - 1
+    )
+
+
+def with_paged_rank(queryset, partition):
+    """
+    with_rank for paginated lists: `rank` counts the siblings placed before
+    each row in a subquery, so it stays the index within the whole
+    partition when a keyset filter keeps only part of it (a window would
+    only number the rows left after the WHERE).
+    """
+    model = queryset.model
+    attname = model._meta.get_field(partition).attname
+    before = (
+        model.objects.filter(**{attname: OuterRef(attname)})
+        .filter(_placed_before(OuterRef("position"), OuterRef("id")))
+        .order_by()
+        .annotate(count=Func("pk", function="COUNT", output_field=IntegerField()))
+        .values("count")
+    )
+    return queryset.annotate(rank=Subquery(before))
+
+
+def _placed_before(position, id):
+    # Rows ahead of (position, id) in board order.
+    return Q(position__lt=position) | Q(position=position, id__lt=id)
+
+
+def dense_position(instance, partition):
+    """
+    Dense 0-based index of `instance` within `partition`: the annotated `rank`
+    when present, otherwise a single COUNT over its siblings.
+    """
+    rank = getattr(instance, "rank", None)
+    if rank is not None or instance.position is None:
+        return rank
+
+    attname = instance._meta.get_field(partition).attname
+    return (
+        type(instance)
+        .objects.filter(**{attname: getattr(instance, attname)})
+        .filter(_placed_before(instance.position, instance.id))
+        .count()
+    )
@@ -0,0 +1,53 @@
+from .models import Attraction, Column, Trip, VisitedAttraction
+
+# Foreign keys to follow from each model up to the object that holds the
+# owner. Attraction and VisitedAttraction carry a denormalized copy of it.
+OWNER_PATHS = {
+    Trip: [],
+    Column: ["trip_id"],
+    Attraction: [],
+    VisitedAttraction: [],
+}
+
+
+def resolve_owner_id(obj):
+    """
+    Return the id of the user owning `obj` (a Trip, Column, Attraction or
+    VisitedAttraction), or None for any other object.
+    Related objects already loaded with select_related are used as they are;
+    the first missing hop is replaced by a single query for the owner_id.
+    """
+    hops = OWNER_PATHS.get(type(obj))
+    if hops is None:
+        return None
+
+    for index, name in enumerate(hops):
+        field = obj._meta.get_field(name)
+        if not field.is_cached(obj):
+            lookup = "__".join(hops[index + 1 :] + ["owner_id"])
+            return (
+                field.related_model.objects.filter(pk=getattr(obj, field.attname))
+                .values_list(lookup, flat=True)
+                .first()
+            )
+        obj = getattr(obj, name)
+    return obj.owner_id
+
+
+def is_owner(user, obj, request=None):
+    """
+    Whether `user` owns `obj`. Compares ids only, so the owner row itself is
+    never loaded, and memoizes the answer on `request` when one is given.
+    """
+    if user is None or not user.is_authenticated:
+        return False
+    if request is None or obj.pk is None:
+        return resolve_owner_id(obj) == user.pk
+
+    cache = getattr(request, "_owner_ids", None)
+    if cache is None:
+        cache = request._owner_ids = {}
+    key = (obj._meta.label, obj.pk)
+    if key not in cache:
+        cache[key] = resolve_owner_id(obj)
+    return cache[key] == user.pk
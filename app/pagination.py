@@ -0,0 +1,141 @@
+import json
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class PlannerCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the list's ordering: each page continues from the
+    ordering key of the last row instead of an OFFSET, so deep pages cost
+    the same as the first one.
+
+    DRF's cursor holds the first ordering field only and steps over rows
+    sharing it with an OFFSET. Here it holds the whole key, which ends with
+    the unique id, so no two rows share a position and no offset is needed.
+    NULLs sort after every value.
+    """
+
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = self.cursor and self.cursor.position
+
+        queryset = queryset.order_by(*self.order_by(reverse))
+        if current_position is not None:
+            queryset = queryset.filter(self.following(current_position, reverse))
+
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering)
+            if has_following
+            else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            values = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip("-")
+            value = (
+                instance[name]
+                if isinstance(instance, dict)
+                else getattr(instance, name)
+            )
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+    def order_by(self, reverse):
+        expressions = []
+        for field in self.ordering:
+            descending = field.startswith("-") != reverse
+            expression = F(field.lstrip("-"))
+            expressions.append(
+                expression.desc(nulls_first=True)
+                if descending
+                else expression.asc(nulls_last=True)
+            )
+        return expressions
+
+    def following(self, position, reverse):
+        """
+        Rows after `position` (JSON list of the key's values) in the order
+        of order_by(reverse): ahead on some field, equal on those before it.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(self.ordering, json.loads(position)):
+            name = field.lstrip("-")
+            null = Q(**{f"{name}__isnull": True})
+            if field.startswith("-") != reverse:
+                # Descending: smaller values; any value is below NULL.
+                ahead = ~null if value is None else Q(**{f"{name}__lt": value})
+            else:
+                # Ascending: larger values, then NULLs; nothing after NULL.
+                ahead = (
+                    Q(pk__in=[])
+                    if value is None
+                    else null | Q(**{f"{name}__gt": value})
+                )
+            condition |= equal & ahead
+            # An exact None matches NULL.
+            equal &= Q(**{name: value})
+        return condition
+
+
+class TripPagination(PlannerCursorPagination):
+    ordering = ("-start_date", "-id")
+
+
+class AttractionPagination(PlannerCursorPagination):
+    ordering = ("column_id_id", "position", "id")
+
+
+class VisitedAttractionPagination(PlannerCursorPagination):
+    ordering = ("-id",)
+
+
+class PostPagination(PlannerCursorPagination):
+    ordering = ("-created_at", "-id")
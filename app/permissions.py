@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from .ownership import is_owner
+
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
@@ -13,23 +15,9 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
             return True
 
         # Write permissions are only allowed to the owner of the trip.
-        # For Trip objects
-        if hasattr(obj, "owner"):
-            return obj.owner == request.user
-
-        # For Column objects (check through trip)
-        if hasattr(obj, "trip_id"):
-            return obj.trip_id.owner == request.user
-
-        # For Attraction objects (check through column -> trip)
-        if hasattr(obj, "column_id"):
-            return obj.column_id.trip_id.owner == request.user
-
-        # For VisitedAttraction objects (check through attraction -> column -> trip)
-        if hasattr(obj, "attraction_id"):
-            return obj.attraction_id.column_id.trip_id.owner == request.user
-
-        return False
+        # Trip, Column, Attraction and VisitedAttraction objects are all
+        # resolved to the trip owner (see app.ownership).
+        return is_owner(request.user, obj, request)
 
 
 class IsTripOwner(permissions.BasePermission):
@@ -39,23 +27,9 @@ class IsTripOwner(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        # For Trip objects
-        if hasattr(obj, "owner"):
-            return obj.owner == request.user
-
-        # For Column objects (check through trip)
-        if hasattr(obj, "trip_id"):
-            return obj.trip_id.owner == request.user
-
-        # For Attraction objects (check through column -> trip)
-        if hasattr(obj, "column_id"):
-            return obj.column_id.trip_id.owner == request.user
-
-        # For VisitedAttraction objects (check through attraction -> column -> trip)
-        if hasattr(obj, "attraction_id"):
-            return obj.attraction_id.column_id.trip_id.owner == request.user
-
-        return False
+        # Trip, Column, Attraction and VisitedAttraction objects are all
+        # resolved to the trip owner (see app.ownership).
+        return is_owner(request.user, obj, request)
 
 
 class IsPostAuthorOrReadOnly(permissions.BasePermission):
@@ -69,4 +43,4 @@ class IsPostAuthorOrReadOnly(permissions.BasePermission):
             return True
 
         # Write permissions are only allowed to the author of the post
-        return obj.author == request.user
+        return obj.author_id == request.user.pk
@@ -0,0 +1,76 @@
+import logging
+import os
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.utils.timezone import now
+
+from .images import cpu_map, enqueue, render_photo
+from .models import VisitPhoto
+from .storage import blob_storage
+
+logger = logging.getLogger(__name__)
+
+# A photo left PROCESSING this long (worker killed mid-batch) is queued again.
+STALE_CLAIM = timedelta(minutes=10)
+
+
+def queue_photos(visit, files):
+    """
+    Store the uploaded `files` of `visit` as PENDING photos and schedule
+    their processing once the transaction commits.
+    """
+    photos = VisitPhoto.objects.bulk_create(
+        [VisitPhoto(visit=visit, original=blob_storage.save(f.name, f)) for f in files]
+    )
+    enqueue(process_photos, [photo.id for photo in photos])
+    return photos
+
+
+def process_photos(ids):
+    """
+    Claim the PENDING photos among `ids` and render them on the process
+    pool. Photos claimed by another worker are skipped.
+    """
+    claimed_at = now()
+    VisitPhoto.objects.filter(id__in=ids, status=VisitPhoto.PENDING).update(
+        status=VisitPhoto.PROCESSING, claimed_at=claimed_at
+    )
+    photos = list(
+        VisitPhoto.objects.filter(
+            id__in=ids, status=VisitPhoto.PROCESSING, claimed_at=claimed_at
+        )
+    )
+
+    paths = [blob_storage.path(photo.original.name) for photo in photos]
+    for photo, (result, error) in zip(photos, cpu_map(render_photo, paths)):
+        if error is not None:
+            logger.warning("Cannot process visit photo %s: %s", photo.id, error)
+            photo.status = VisitPhoto.FAILED
+            continue
+
+        photo.width, photo.height, image, thumbnail = result
+        stem = os.path.splitext(os.path.basename(photo.original.name))[0]
+        photo.image = blob_storage.save(f"{stem}.jpg", ContentFile(image))
+        photo.thumbnail = blob_storage.save(f"{stem}.webp", ContentFile(thumbnail))
+        photo.status = VisitPhoto.READY
+
+    VisitPhoto.objects.bulk_update(
+        photos, ["image", "thumbnail", "width", "height", "status"]
+    )
+    return photos
+
+
+def pending_photo_ids(limit):
+    """
+    Ids of up to `limit` photos waiting to be processed, oldest first,
+    after putting stale claims back in the queue.
+    """
+    VisitPhoto.objects.filter(
+        status=VisitPhoto.PROCESSING, claimed_at__lt=now() - STALE_CLAIM
+    ).update(status=VisitPhoto.PENDING)
+    return list(
+        VisitPhoto.objects.filter(status=VisitPhoto.PENDING)
+        .order_by("id")
+        .values_list("id", flat=True)[:limit]
+    )
@@ -1,7 +1,35 @@
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
-from app.models import Attraction, Column, Post, Trip, VisitedAttraction
+from app.models import (
+    Attraction,
+    Column,
+    Post,
+    Trip,
+    VisitedAttraction,
+    VisitPhoto,
+    positions_are_gapped,
+)
+from app.ordering import dense_position
+from app.ownership import is_owner
+
+
+class DensePositionMixin:
+    """
+    In gapped mode the stored position is a sparse ordering key; clients
+    always see the dense 0..n-1 index within `position_partition`.
+    """
+
+    position_partition = None
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        if positions_are_gapped():
+            representation["position"] = dense_position(
+                instance, self.position_partition
+            )
+        return representation
 
 
 class TripSerializer(serializers.ModelSerializer):
@@ -34,7 +62,8 @@ class TripSerializer(serializers.ModelSerializer):
         return data
 
 
-class ColumnSerializer(serializers.ModelSerializer):
+class ColumnSerializer(DensePositionMixin, serializers.ModelSerializer):
+    position_partition = "trip_id"
     trip_destination = serializers.CharField(
         source="trip_id.destination", read_only=True
     )
@@ -43,19 +72,30 @@ class ColumnSerializer(serializers.ModelSerializer):
         model = Column
         fields = ["id", "trip_id", "trip_destination", "title", "position"]
 
+    def get_unique_together_validators(self):
+        # Gapped keys are assigned by the view, the posted position is an index.
+        if positions_are_gapped():
+            return []
+        return super().get_unique_together_validators()
+
     def validate_trip_id(self, value):
         """
         Ensure the trip belongs to the current user.
         """
         request = self.context.get("request")
-        if request and hasattr(request, "user") and value.owner != request.user:
+        if (
+            request
+            and hasattr(request, "user")
+            and not is_owner(request.user, value, request)
+        ):
             raise serializers.ValidationError(
                 "You cannot add columns to trips you don't own."
             )
         return value
 
 
-class AttractionSerializer(serializers.ModelSerializer):
+class AttractionSerializer(DensePositionMixin, serializers.ModelSerializer):
+    position_partition = "column_id"
     column_title = serializers.CharField(source="column_id.title", read_only=True)
     trip_destination = serializers.CharField(
         source="column_id.trip_id.destination", read_only=True
@@ -84,7 +124,7 @@ class AttractionSerializer(serializers.ModelSerializer):
         """
         request = self.context.get("request")
         if request and hasattr(request, "user"):
-            if value.trip_id.owner != request.user:
+            if not is_owner(request.user, value, request):
                 raise serializers.ValidationError(
                     "You cannot add attractions to trips you don't own."
                 )
@@ -99,6 +139,57 @@ class AttractionSerializer(serializers.ModelSerializer):
         return value
 
 
+class AttractionMoveSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    column_id = serializers.IntegerField()
+    position = serializers.IntegerField(min_value=0)
+
+
+class BulkMoveSerializer(serializers.Serializer):
+    moves = AttractionMoveSerializer(many=True, allow_empty=False)
+
+    def validate_moves(self, value):
+        """
+        Ensure each attraction is moved at most once.
+        """
+        ids = [move["id"] for move in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each attraction can only move once.")
+        return value
+
+
+class ImportCardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Attraction
+        fields = [
+            "title",
+            "location",
+            "category",
+            "mapUrl",
+            "ticket",
+            "cost",
+            "visited",
+        ]
+
+    def validate_cost(self, value):
+        """
+        Ensure cost is not negative.
+        """
+        if value < 0:
+            raise serializers.ValidationError("Cost cannot be negative")
+        return value
+
+
+class ImportColumnSerializer(serializers.Serializer):
+    """
+    One column of an imported board, in the shape grouped_attractions returns.
+    Ids and positions in the document are ignored.
+    """
+
+    title = serializers.CharField(max_length=100, default="Day")
+    cards = ImportCardSerializer(many=True, default=list)
+
+
 class VisitedAttractionSerializer(serializers.ModelSerializer):
     attraction_title = serializers.CharField(
         source="attraction_id.title", read_only=True
@@ -124,16 +215,35 @@ class VisitedAttractionSerializer(serializers.ModelSerializer):
         """
         request = self.context.get("request")
         if request and hasattr(request, "user"):
-            if value.column_id.trip_id.owner != request.user:
+            if not is_owner(request.user, value, request):
                 raise serializers.ValidationError(
                     "You cannot add visits to attractions you don't own."
                 )
         return value
 
 
+class VisitPhotoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VisitPhoto
+        fields = [
+            "id",
+            "visit",
+            "status",
+            "image",
+            "thumbnail",
+            "width",
+            "height",
+            "created_at",
+        ]
+        read_only_fields = fields
+
+
 class PostSerializer(serializers.ModelSerializer):
     author = serializers.ReadOnlyField(source="author.id")
     author_username = serializers.SerializerMethodField()
+    # Rendered as a URL by to_representation().
+    picture = serializers.ImageField(required=False, allow_null=True, use_url=False)
+    picture_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -146,6 +256,7 @@ class PostSerializer(serializers.ModelSerializer):
             "slug",
             "created_at",
             "picture",
+            "picture_srcset",
         ]
         read_only_fields = ["slug", "created_at", "author"]
 
@@ -163,18 +274,36 @@ class PostSerializer(serializers.ModelSerializer):
             return first.capitalize()
         return user.email
 
+    def get_picture_srcset(self, obj):
+        """
+        `srcset` strings per format, e.g. {"webp": "<url> 320w, <url> 640w"}.
+        Empty until the image workers have rendered the picture.
+        """
+        srcset = {}
+        for width, names in sorted(obj.renditions.items(), key=lambda x: int(x[0])):
+            for ext, name in names.items():
+                url = self.absolute_url(default_storage.url(name))
+                srcset.setdefault(ext, []).append(f"{url} {width}w")
+        return {ext: ", ".join(sources) for ext, sources in srcset.items()}
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         if instance.picture:
-            request = self.context.get("request")
-            if request:
-                representation["picture"] = request.build_absolute_uri(
-                    instance.picture.url
-                )
-            else:
-                representation["picture"] = instance.picture.url
+            representation["picture"] = self.absolute_url(instance.picture.url)
         return representation
 
+    def absolute_url(self, url):
+        """
+        `url` made absolute for the request, if any. The scheme and host are
+        worked out once per serializer context, not once per URL.
+        """
+        request = self.context.get("request")
+        if request is None or not url.startswith("/") or url.startswith("//"):
+            return url
+        if "_site_root" not in self.context:
+            self.context["_site_root"] = request.build_absolute_uri("/")[:-1]
+        return self.context["_site_root"] + url
+
     def get_picture(self, obj):
         if obj.picture:
             request = self.context.get("request")
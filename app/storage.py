@@ -0,0 +1,140 @@
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+BLOB_PREFIX = "blobs"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every distinct file once, as blobs/<aa>/<sha256><ext> under
+    MEDIA_ROOT, whatever name it was uploaded with.
+    The hash is computed while the upload is streamed to a temporary file,
+    which is then renamed into place (or dropped when the blob exists).
+    Each save takes a reference on the Blob row and each delete releases
+    one; unreferenced files are removed by the gc_blobs command.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content only, see _save().
+        return name
+
+    def _save(self, name, content):
+        directory = self.path(BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    handle.write(chunk)
+
+            extension = os.path.splitext(name)[1].lower()
+            name = blob_name(digest.hexdigest(), extension)
+            # Take the reference before the file check so gc_blobs never
+            # collects a blob that is being saved again.
+            acquire_blob(name, size)
+            target = self.path(name)
+            if os.path.exists(target):
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.chmod(temporary, self.file_permissions_mode or 0o644)
+                os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+    def delete(self, name):
+        """
+        Release one reference; the file itself stays until gc_blobs.
+        """
+        if name:
+            release_blob(name)
+
+    def delete_file(self, name):
+        """
+        Remove the blob file itself (used by gc_blobs).
+        """
+        super().delete(name)
+
+
+def blob_name(digest, extension=""):
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest}{extension}"
+
+
+def acquire_blob(name, size):
+    Blob = apps.get_model("app", "Blob")
+    with transaction.atomic():
+        blob, created = Blob.objects.select_for_update().get_or_create(
+            name=name, defaults={"size": size, "refcount": 1}
+        )
+        if not created:
+            Blob.objects.filter(pk=blob.pk).update(
+                refcount=F("refcount") + 1, last_used_at=now()
+            )
+
+
+def release_blob(name):
+    Blob = apps.get_model("app", "Blob")
+    Blob.objects.filter(name=name, refcount__gt=0).update(refcount=F("refcount") - 1)
+
+
+blob_storage = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    # Callable storage for FileFields, so migrations reference this
+    # function instead of serializing the storage instance.
+    return blob_storage
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Uploaded file is too large."
+    default_code = "upload_too_large"
+
+
+class MaxSizeUploadHandler(FileUploadHandler):
+    """
+    Rejects an uploaded file as soon as it grows past MAX_UPLOAD_SIZE,
+    before the rest of the request body is read or buffered.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_UPLOAD_SIZE:
+            raise UploadTooLarge(
+                f"{self.file_name} is larger than {settings.MAX_UPLOAD_SIZE} bytes."
+            )
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def limit_upload_size(request):
+    """
+    Install MaxSizeUploadHandler on `request`; must run before the body is
+    parsed (request.data / request.FILES).
+    """
+    request.upload_handlers.insert(0, MaxSizeUploadHandler(request))
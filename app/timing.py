@@ -0,0 +1,164 @@
+"""
+Opt-in Server-Timing header (SERVER_TIMING=True) breaking each API response
+down into phases, shown by the browser devtools under Network > Timing:
+
+    auth, perm      DRF authentication and permission checks
+    db              time in database queries (from app.metrics)
+    serialize       serializer .data
+    render          the renderer (JSON, browsable API)
+    total           the whole request, middleware included
+
+Phases overlap: queries run while checking permissions or serializing are
+in both that phase and db.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+
+from .metrics import request_db_stats
+
+# Phase name -> seconds, for the request being served.
+_timings = ContextVar("server_timings", default=None)
+
+
+@contextmanager
+def phase(name):
+    """
+    Add the time spent in the block to the `name` phase of the current
+    request. Free when Server-Timing is off.
+    """
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0) + time.perf_counter() - started
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the phases of each request and sends them as Server-Timing.
+    Goes right after app.metrics.MetricsMiddleware, which counts the queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(response, timings, started)
+
+    async def __acall__(self, request):
+        timings, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(response, timings, started)
+
+    def start(self):
+        timings = {}
+        return timings, _timings.set(timings), time.perf_counter()
+
+    def finish(self, response, timings, started):
+        entries = [
+            f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()
+        ]
+        db = request_db_stats()
+        if db is not None:
+            queries, seconds = db
+            entries.append(f'db;dur={seconds * 1000:.2f};desc="{queries} queries"')
+        entries.append(f"total;dur={(time.perf_counter() - started) * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+        # Lets the frontend on another origin read the entries too.
+        response.headers["Timing-Allow-Origin"] = "*"
+        return response
+
+
+class ServerTimingMixin:
+    """
+    DRF view mixin timing the auth, perm, serialize and render phases.
+    """
+
+    def perform_authentication(self, request):
+        with phase("auth"):
+            super().perform_authentication(request)
+
+    def check_permissions(self, request):
+        with phase("perm"):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with phase("perm"):
+            super().check_object_permissions(request, obj)
+
+    def get_serializer_class(self):
+        cls = super().get_serializer_class()
+        return timed_serializer(cls) if _timings.get() is not None else cls
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Render now rather than in the handler, to time it on its own.
+        if _timings.get() is not None and isinstance(response, Response):
+            with phase("render"):
+                response.render()
+        return response
+
+
+class TimedDataMixin:
+    """
+    Times serializer .data as the serialize phase.
+    """
+
+    @property
+    def data(self):
+        with phase("serialize"):
+            return super().data
+
+
+_timed_classes = {}
+
+
+def timed_serializer(cls):
+    """
+    Subclass of serializer class `cls` whose .data is timed, built once per
+    class. Its list serializer (many=True) is timed too: that is the one
+    whose .data a list view reads.
+    """
+    if cls not in _timed_classes:
+        meta = getattr(cls, "Meta", object)
+        list_class = getattr(meta, "list_serializer_class", ListSerializer)
+        timed_list = type(list_class.__name__, (TimedDataMixin, list_class), {})
+        _timed_classes[cls] = type(
+            cls.__name__,
+            (TimedDataMixin, cls),
+            {
+                "Meta": type("Meta", (meta,), {"list_serializer_class": timed_list}),
+                "__module__": cls.__module__,
+            },
+        )
+    return _timed_classes[cls]
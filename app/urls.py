@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (
     AttractionViewSet,
     ColumnViewSet,
@@ -8,6 +9,8 @@ from .views import (
     PostViewSet,
     TripViewSet,
     VisitedAttractionViewSet,
+    delete_upload,
+    upload_image,
 )
 
 router = DefaultRouter()
@@ -24,4 +27,16 @@ router.register(
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("upload/", upload_image, name="upload-image"),
+    path("upload/<int:pk>/", delete_upload, name="upload-detail"),
+    # Async read path for ASGI deployments (see app.async_views).
+    path("async/trip/", async_views.trip_list, name="async-trip-list"),
+    path("async/trip/<int:pk>/", async_views.trip_detail, name="async-trip-detail"),
+    path(
+        "async/grouped_attractions/",
+        async_views.grouped_attractions,
+        name="async-grouped-attractions",
+    ),
+    path("async/posts/", async_views.post_list, name="async-posts-list"),
+    path("async/posts/recent/", async_views.recent_posts, name="async-posts-recent"),
 ]
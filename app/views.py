@@ -1,33 +1,142 @@
+from functools import partial
+
+from django.core.cache import cache
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.timezone import now
 from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view
 from rest_framework.decorators import permission_classes as permission_decorator
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
-from .models import Attraction, Column, Post, Trip, VisitedAttraction
+from .budget import trip_budget
+from .cache import RECENT_POSTS_TIMEOUT, posts_version, recent_posts_key
+from .conditional import conditional_response
+from .export import export_trip
+from .importing import import_board
+from .models import (
+    Attraction,
+    Column,
+    Post,
+    Trip,
+    Upload,
+    VisitedAttraction,
+    positions_are_gapped,
+)
+from .ordering import (
+    attraction_position,
+    bulk_move_attractions,
+    column_position,
+    move_attraction,
+    reorder_column,
+    with_paged_rank,
+    with_rank,
+)
+from .ownership import is_owner
+from .pagination import (
+    AttractionPagination,
+    PostPagination,
+    TripPagination,
+    VisitedAttractionPagination,
+)
 from .permissions import IsPostAuthorOrReadOnly, IsTripOwner
+from .photos import queue_photos
 from .serializers import (
     AttractionSerializer,
+    BulkMoveSerializer,
     ColumnSerializer,
+    ImportColumnSerializer,
     PostSerializer,
     TripSerializer,
     VisitedAttractionSerializer,
+    VisitPhotoSerializer,
 )
+from .storage import limit_upload_size
+from .timing import ServerTimingMixin, phase
+
+MAX_PHOTOS_PER_UPLOAD = 20
+
+
+def group_attractions(columns):
+    """
+    Build the kanban payload for `columns`: one entry per column with its
+    serialized cards, in a fixed number of queries whatever the board size.
+    """
+    return group_cards(columns, board_attractions(columns))
+
+
+def board_attractions(columns):
+    # Pull column and trip in the same query so serializing a card
+    # never triggers a lazy lookup.
+    attractions = (
+        Attraction.objects.filter(column_id__in=columns)
+        .select_related("column_id__trip_id")
+        .order_by("position")
+    )
+    if positions_are_gapped():
+        attractions = with_rank(attractions, "column_id")
+    return attractions
+
+
+def with_board_version(trips):
+    """
+    Annotate `trips` with what changes whenever their board does: the number
+    of columns and cards (deletions) and their latest updated_at (saves).
+    """
+    annotations = {}
+    for name, model in (("columns", Column), ("cards", Attraction)):
+        rows = model.objects.filter(trip_id=OuterRef("pk")).order_by().values("trip_id")
+        annotations[f"{name}_count"] = Subquery(
+            rows.annotate(count=Count("pk")).values("count")
+        )
+        annotations[f"{name}_changed_at"] = Subquery(
+            rows.annotate(changed_at=Max("updated_at")).values("changed_at")
+        )
+    return trips.only("id", "updated_at").annotate(**annotations)
+
+
+def board_version(trip):
+    """
+    ETag version of a trip loaded through with_board_version(). The trip's
+    own updated_at covers trip_destination on the cards.
+    """
+    return (
+        f"{trip.updated_at}:{trip.columns_count}:{trip.columns_changed_at}:"
+        f"{trip.cards_count}:{trip.cards_changed_at}"
+    )
+
+
+def group_cards(columns, attractions):
+    grouped_data = {
+        col.id: {"id": str(col.id), "title": col.title, "cards": []} for col in columns
+    }
 
+    with phase("serialize"):
+        cards = AttractionSerializer(attractions, many=True).data
+    for card in cards:
+        col_id = card["column_id"]
+        if col_id in grouped_data:
+            grouped_data[col_id]["cards"].append(card)
 
-class TripViewSet(viewsets.ModelViewSet):
+    return list(grouped_data.values())
+
+
+class TripViewSet(ServerTimingMixin, viewsets.ModelViewSet):
     serializer_class = TripSerializer
     permission_classes = (IsAuthenticated, IsTripOwner)
+    pagination_class = TripPagination
 
     def get_queryset(self):
         # Filter trips to only show those owned by the current user.
         if getattr(self, "swagger_fake_view", False) or self.request.user.is_anonymous:
             return Trip.objects.none()
-        return Trip.objects.filter(owner=self.request.user)
+        # Through the related manager, trip.owner is request.user itself and
+        # owner_email is served without loading the owner again.
+        return self.request.user.trips.all()
 
     def perform_create(self, serializer):
         # Automatically set the owner to the current user when creating a trip.
@@ -35,13 +144,54 @@ class TripViewSet(viewsets.ModelViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         trip = self.get_object()
-        if trip.owner != request.user:
+        if not is_owner(request.user, trip, request):
             raise PermissionDenied("You do not have permission to access this trip.")
         serializer = self.get_serializer(trip)
         return Response(serializer.data)
 
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        """
+        Stream the whole trip board (trip, columns, attractions and visits)
+        as NDJSON, reading the rows in chunks.
+        """
+        trip = self.get_object()
+        response = StreamingHttpResponse(
+            export_trip(trip), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="trip-{trip.id}.ndjson"'
+        )
+        return response
 
-class ColumnViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=["get"])
+    def budget(self, request, pk=None):
+        """
+        Planned (card costs) and actual (visit costs) totals of the trip, per
+        day and per category, read from the maintained summary table.
+        """
+        return Response(trip_budget(self.get_object()))
+
+    @action(detail=True, methods=["post"], url_path="import")
+    def import_board(self, request, pk=None):
+        """
+        Append a whole board (a list of columns with their cards, as returned
+        by grouped_attractions) to the trip. The document is validated up
+        front and stored with bulk inserts.
+        """
+        trip = self.get_object()
+        serializer = ImportColumnSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            # Serialize concurrent imports into the same trip.
+            trip = Trip.objects.select_for_update().get(pk=trip.pk)
+            columns = import_board(trip, serializer.validated_data)
+
+        return Response(group_attractions(columns), status=status.HTTP_201_CREATED)
+
+
+class ColumnViewSet(ServerTimingMixin, viewsets.ModelViewSet):
     serializer_class = ColumnSerializer
     permission_classes = [IsAuthenticated, IsTripOwner]
 
@@ -49,7 +199,9 @@ class ColumnViewSet(viewsets.ModelViewSet):
         # Safety check for Swagger schema generation
         if getattr(self, "swagger_fake_view", False) or self.request.user.is_anonymous:
             return Column.objects.none()
-        queryset = Column.objects.filter(trip_id__owner=self.request.user)
+        queryset = Column.objects.filter(
+            trip_id__owner=self.request.user
+        ).select_related("trip_id")
         trip_id = self.request.query_params.get("trip_id", None)
 
         if trip_id is not None:
@@ -57,41 +209,96 @@ class ColumnViewSet(viewsets.ModelViewSet):
             trip = get_object_or_404(Trip, id=trip_id, owner=self.request.user)
             queryset = queryset.filter(trip_id=trip)
 
+        if self.action == "list" and positions_are_gapped():
+            queryset = with_rank(queryset, "trip_id")
         return queryset
 
     def perform_create(self, serializer):
         # Verify the trip belongs to the user before creating a column.
         trip = serializer.validated_data.get("trip_id")
-        if trip.owner != self.request.user:
+        if not is_owner(self.request.user, trip, self.request):
             raise PermissionDenied("You cannot add columns to trips you don't own.")
-        serializer.save()
+        if positions_are_gapped():
+            position = serializer.validated_data["position"]
+            with transaction.atomic():
+                serializer.save(position=column_position(trip.id, position))
+        else:
+            serializer.save()
+
+    def perform_update(self, serializer):
+        """
+        In gapped mode a posted position is an index, turned into a free key
+        of the trip board like on create. A column moved to another trip
+        without a position goes last.
+        """
+        column = serializer.instance
+        trip = serializer.validated_data.get("trip_id", column.trip_id)
+        position = serializer.validated_data.get("position")
+        moved = trip.id != column.trip_id_id
+        if not positions_are_gapped() or (position is None and not moved):
+            serializer.save()
+            return
+        with transaction.atomic():
+            if position is None:
+                position = Column.objects.filter(trip_id=trip).count()
+            key = column_position(trip.id, position, exclude=column)
+            serializer.save(position=key)
 
 
-class AttractionViewSet(viewsets.ModelViewSet):
+class AttractionViewSet(ServerTimingMixin, viewsets.ModelViewSet):
     serializer_class = AttractionSerializer
     permission_classes = [IsAuthenticated, IsTripOwner]
+    pagination_class = AttractionPagination
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False) or self.request.user.is_anonymous:
             return Attraction.objects.none()
-        return Attraction.objects.filter(column_id__trip_id__owner=self.request.user)
+        queryset = Attraction.objects.filter(owner=self.request.user).select_related(
+            "column_id__trip_id"
+        )
+        if self.action == "list" and positions_are_gapped():
+            queryset = with_paged_rank(queryset, "column_id")
+        return queryset
 
     def perform_create(self, serializer):
         """
         Verify the column (and by extension, the trip) belongs to the user.
         """
         column = serializer.validated_data.get("column_id")
-        if column.trip_id.owner != self.request.user:
+        if not is_owner(self.request.user, column, self.request):
             raise PermissionDenied("You cannot add attractions to trips you don't own.")
-        serializer.save()
+        self.save_at_position(serializer, column)
+
+    def perform_update(self, serializer):
+        column = serializer.validated_data.get(
+            "column_id", serializer.instance.column_id
+        )
+        self.save_at_position(serializer, column)
+
+    def save_at_position(self, serializer, column):
+        """
+        In gapped mode a posted position is an index into `column`, turned
+        into a free key exactly as a move would.
+        """
+        position = serializer.validated_data.get("position")
+        if positions_are_gapped() and position is not None:
+            with transaction.atomic():
+                key = attraction_position(
+                    column.id, position, exclude=serializer.instance
+                )
+                serializer.save(position=key)
+        else:
+            serializer.save()
 
     def perform_destroy(self, instance):
         """
         Gap Closure: Reorder column after an attraction is deleted.
+        Gapped positions tolerate holes, so there is nothing to close.
         """
         col_id = instance.column_id_id
         instance.delete()
-        self._reorder_column(col_id)
+        if not positions_are_gapped():
+            self._reorder_column(col_id)
 
     @action(detail=True, methods=["patch"], url_path="move")
     def move(self, request, pk=None):
@@ -99,62 +306,66 @@ class AttractionViewSet(viewsets.ModelViewSet):
         Move a single attraction to a new column and/or position
         """
         attraction = self.get_object()
-        new_col_id = request.data.get("column_id", attraction.column_id_id)
-        new_pos = int(request.data.get("position", 0))
-        old_col_id = attraction.column_id_id
-        old_pos = attraction.position
+        try:
+            new_col_id = int(request.data.get("column_id", attraction.column_id_id))
+            new_pos = int(request.data.get("position", 0))
+        except (TypeError, ValueError):
+            raise ValidationError("column_id and position must be integers.")
+        if (
+            new_col_id != attraction.column_id_id
+            and not Column.objects.filter(
+                pk=new_col_id, trip_id__owner=request.user
+            ).exists()
+        ):
+            raise ValidationError("You cannot move attractions to trips you don't own.")
 
         with transaction.atomic():
-            # Moving within the SAME column
-            if str(old_col_id) == str(new_col_id):
-                if new_pos > old_pos:
-                    Attraction.objects.filter(
-                        column_id_id=new_col_id,
-                        position__gt=old_pos,
-                        position__lte=new_pos,
-                    ).update(position=F("position") - 1)
-
-                elif new_pos < old_pos:
-                    Attraction.objects.filter(
-                        column_id_id=new_col_id,
-                        position__gte=new_pos,
-                        position__lt=old_pos,
-                    ).update(position=F("position") + 1)
-
-                # Update the item itself
-                attraction.position = new_pos
-                attraction.save()
-
-            # Moving to a DIFFERENT column
-            else:
-                Attraction.objects.filter(
-                    column_id_id=new_col_id, position__gte=new_pos
-                ).update(position=F("position") + 1)
-
-                attraction.column_id_id = new_col_id
-                attraction.position = new_pos
-                attraction.save()
-
-                self._reorder_column(old_col_id)
+            move_attraction(attraction, new_col_id, new_pos)
 
         serializer = self.get_serializer(attraction)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["post"], url_path="bulk_move")
+    def bulk_move(self, request):
+        """
+        Move several attractions in one request, e.g. when a whole day is
+        reordered. Moves are applied in the order given and the final order
+        of every affected column is returned.
+        """
+        serializer = BulkMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        moves = serializer.validated_data["moves"]
+
+        attraction_ids = {move["id"] for move in moves}
+        column_ids = {move["column_id"] for move in moves}
+
+        with transaction.atomic():
+            owned = self.get_queryset().filter(id__in=attraction_ids)
+            if owned.count() != len(attraction_ids):
+                raise PermissionDenied("You cannot move attractions you don't own.")
+
+            targets = Column.objects.filter(
+                id__in=column_ids, trip_id__owner=request.user
+            )
+            if targets.count() != len(column_ids):
+                raise PermissionDenied(
+                    "You cannot move attractions to trips you don't own."
+                )
+
+            affected = bulk_move_attractions(moves)
+
+        columns = Column.objects.filter(id__in=affected).order_by("id")
+        return Response(group_attractions(columns))
+
     def _reorder_column(self, column_id):
         """
         Force-updates the database so positions are strictly 0, 1, 2, 3...
+        in a single set-based statement (see app.ordering).
         """
-        attractions = Attraction.objects.filter(column_id_id=column_id).order_by(
-            "position", "id"
-        )
-
-        for index, attraction in enumerate(attractions):
-            if attraction.position != index:
-                attraction.position = index
-                attraction.save(update_fields=["position"])
+        reorder_column(column_id)
 
 
-class GroupedAttractionsViewSet(viewsets.ViewSet):
+class GroupedAttractionsViewSet(ServerTimingMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
     def list(self, request):
@@ -165,39 +376,34 @@ class GroupedAttractionsViewSet(viewsets.ViewSet):
 
         if not trip_id:
             return Response({"error": "trip_id is required"}, status=400)
-        # Verify the trip belongs to the user
-        trip = get_object_or_404(Trip, id=trip_id, owner=request.user)
+        # Verify the trip belongs to the user; the same query reads the board
+        # version, so an unchanged board is answered with 304 right away.
+        trip = get_object_or_404(
+            with_board_version(Trip.objects.all()), id=trip_id, owner=request.user
+        )
         columns = Column.objects.filter(trip_id=trip).order_by("id")
-        attractions = Attraction.objects.filter(column_id__trip_id=trip).order_by(
-            "position"
+        return conditional_response(
+            request,
+            board_version(trip),
+            None,
+            lambda: Response(group_attractions(columns)),
         )
 
-        grouped_data = {
-            col.id: {"id": str(col.id), "title": col.title, "cards": []}
-            for col in columns
-        }
-
-        for attraction in attractions:
-            col_id = attraction.column_id.id
-            if col_id in grouped_data:
-                grouped_data[col_id]["cards"].append(
-                    AttractionSerializer(attraction).data
-                )
-
-        return Response(list(grouped_data.values()))
-
 
-class VisitedAttractionViewSet(viewsets.ModelViewSet):
+class VisitedAttractionViewSet(ServerTimingMixin, viewsets.ModelViewSet):
     serializer_class = VisitedAttractionSerializer
     permission_classes = [IsAuthenticated, IsTripOwner]
+    pagination_class = VisitedAttractionPagination
+
+    def initial(self, request, *args, **kwargs):
+        limit_upload_size(request)
+        super().initial(request, *args, **kwargs)
 
     def get_queryset(self):
         if getattr(self, "swagger_fake_view", False) or self.request.user.is_anonymous:
             return VisitedAttraction.objects.none()
 
-        return VisitedAttraction.objects.filter(
-            attraction_id__column_id__trip_id__owner=self.request.user
-        ).select_related(
+        return VisitedAttraction.objects.filter(owner=self.request.user).select_related(
             "attraction_id",
             "attraction_id__column_id",
             "attraction_id__column_id__trip_id",
@@ -208,18 +414,65 @@ class VisitedAttractionViewSet(viewsets.ModelViewSet):
         Verify the attraction belongs to the user before creating a visit record.
         """
         attraction = serializer.validated_data.get("attraction_id")
-        if attraction.column_id_id.trip_id.owner != self.request.user:
+        if not is_owner(self.request.user, attraction, self.request):
             raise PermissionDenied(
                 "You cannot add visits to attractions you don't own."
             )
-        serializer.save()
+        serializer.save(reviewed_at=now())
+
+    @action(detail=True, methods=["get", "post"], url_path="photos")
+    def photos(self, request, pk=None):
+        """
+        GET lists the visit's photos. POST uploads a batch of them (multipart,
+        repeated `photos` field) and answers 202 right away: the photos are
+        processed in the background and move from "pending" to "ready".
+        """
+        visit = self.get_object()
+        if request.method == "GET":
+            serializer = VisitPhotoSerializer(
+                visit.photos.all(), many=True, context={"request": request}
+            )
+            return Response(serializer.data)
+
+        files = request.FILES.getlist("photos")
+        if not files:
+            return Response(
+                {"error": "No photos provided"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(files) > MAX_PHOTOS_PER_UPLOAD:
+            return Response(
+                {"error": f"At most {MAX_PHOTOS_PER_UPLOAD} photos per upload"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        photos = queue_photos(visit, files)
+        serializer = VisitPhotoSerializer(
+            photos, many=True, context={"request": request}
+        )
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+class PostViewSet(ServerTimingMixin, viewsets.ModelViewSet):
+    # The author is read for author/author_username only; one JOIN instead
+    # of a query per card, without the rest of the user row.
+    queryset = Post.objects.select_related("author").only(
+        *(field.name for field in Post._meta.concrete_fields),
+        "author__name",
+        "author__last_name",
+        "author__email",
+    )
     serializer_class = PostSerializer
     lookup_field = "slug"
     permission_classes = [IsAuthenticatedOrReadOnly, IsPostAuthorOrReadOnly]
+    pagination_class = PostPagination
+
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            posts_version(),
+            None,
+            partial(super().list, request, *args, **kwargs),
+        )
 
     def perform_create(self, serializer):
         # Automatically set the author to the logged-in user
@@ -231,29 +484,63 @@ class PostViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["GET"])
     def recent(self, request):
-        posts = Post.objects.all()[:6]
-        serializer = PostSerializer(posts, many=True, context={"request": request})
-        return Response(serializer.data)
+        """
+        The six newest posts, rendered once and served from the cache until
+        a post is saved or deleted.
+        """
+        version = posts_version()
+        return conditional_response(
+            request, version, None, partial(self.render_recent, request, version)
+        )
+
+    def render_recent(self, request, version):
+        key = recent_posts_key(request, version)
+        data = cache.get(key)
+        if data is None:
+            posts = self.get_queryset()[:6]
+            serializer = PostSerializer(posts, many=True, context={"request": request})
+            with phase("serialize"):
+                data = serializer.data
+            cache.set(key, data, RECENT_POSTS_TIMEOUT)
+        return Response(data)
 
 
 @api_view(["POST"])
 @permission_decorator([IsAuthenticated])
 def upload_image(request):
     """
-    Standalone endpoint for image upload
+    Standalone endpoint for image upload.
+    The file goes to the content-addressed storage, so uploading the same
+    photo again returns the existing blob instead of storing a copy. It is
+    kept until the owner deletes it through upload/<id>/.
     """
+    limit_upload_size(request)
     if "image" not in request.FILES:
         return Response(
             {"error": "No image provided"}, status=status.HTTP_400_BAD_REQUEST
         )
 
     image = request.FILES["image"]
+    upload = Upload.objects.create(owner=request.user, file=image)
 
     return Response(
         {
             "message": "Image uploaded successfully",
+            "id": upload.id,
             "filename": image.name,
             "size": image.size,
+            "name": upload.file.name,
+            "url": request.build_absolute_uri(upload.file.url),
         },
         status=status.HTTP_200_OK,
     )
+
+
+@api_view(["DELETE"])
+@permission_decorator([IsAuthenticated])
+def delete_upload(request, pk):
+    """
+    Delete a standalone upload of the current user, releasing its blob.
+    """
+    get_object_or_404(Upload, pk=pk, owner=request.user).delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,95 @@
+"""
+Concurrency limits of a deployment: ramp up slow clients against a read
+endpoint and report, per level, how many were served and how fast.
+
+    # WSGI: each slow client holds a sync worker for the whole exchange
+    gunicorn planner.wsgi:application --workers 2 --bind 127.0.0.1:8000
+    python benchmarks/asgi_load.py --path /api/trip/ --token <access token>
+
+    # ASGI: the async read path holds no worker while clients trickle
+    uvicorn planner.asgi:application --workers 2 --port 8001
+    python benchmarks/asgi_load.py --base-url http://127.0.0.1:8001 \\
+        --path /api/async/trip/ --token <access token>
+
+A slow client sends half of its request, waits --client-delay seconds (a
+mobile link, a slow upload), sends the rest and reads the response. With
+N WSGI workers, requests past the first N queue behind the slow ones;
+under ASGI the latency stays near the delay until the CPU is the limit.
+"""
+
+import argparse
+import socket
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def slow_get(host, port, path, token, delay, timeout):
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+        f"Authorization: Bearer {token}\r\nConnection: close\r\n\r\n"
+    ).encode()
+    started = time.perf_counter()
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(request[: len(request) // 2])
+            time.sleep(delay)
+            sock.sendall(request[len(request) // 2 :])
+            response = b""
+            while chunk := sock.recv(65536):
+                response += chunk
+    except OSError:
+        return None, time.perf_counter() - started
+    status = int(response.split(b" ", 2)[1]) if response else None
+    return status, time.perf_counter() - started
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/async/trip/")
+    parser.add_argument("--token", default="", help="JWT access token.")
+    parser.add_argument("--levels", type=int, nargs="+", default=[8, 32, 128, 256, 512])
+    parser.add_argument("--client-delay", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    url = urlsplit(args.base_url)
+    host, port = url.hostname, url.port or 80
+    for level in args.levels:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            results = list(
+                pool.map(
+                    lambda _: slow_get(
+                        host,
+                        port,
+                        args.path,
+                        args.token,
+                        args.client_delay,
+                        args.timeout,
+                    ),
+                    range(level),
+                )
+            )
+        elapsed = time.perf_counter() - started
+
+        ok = [latency for status, latency in results if status == 200]
+        line = f"{level:>4} clients: {len(ok)} ok, {level - len(ok)} failed"
+        if ok:
+            line += (
+                f", p50 {statistics.median(ok):.2f} s, "
+                f"p99 {percentile(ok, 0.99):.2f} s, "
+                f"{len(ok) / elapsed:.1f} req/s"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
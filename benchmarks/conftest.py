@@ -0,0 +1,281 @@
+"""
+Benchmark suite: latency and query counts of every API action against a
+large seeded dataset, compared with benchmarks/baseline.json.
+
+    # SQLite (the settings switch to it under GITHUB_ACTIONS=true)
+    GITHUB_ACTIONS=true RUN_BENCHMARKS=1 pytest benchmarks --no-cov
+    # local Postgres, configured as usual through .env
+    RUN_BENCHMARKS=1 pytest benchmarks --no-cov
+
+Query counts are compared exactly: they do not depend on the size of the
+dataset, so any increase is a new query per row (or per request). Median
+latencies are compared with a margin (BENCHMARK_MARGIN, default 0.5 for
++50%, plus BENCHMARK_SLACK_MS), and only against a baseline recorded on
+the same database vendor and scale. Latencies depend on the machine:
+record the baseline where you compare, e.g. on main before testing a
+branch. BENCHMARK_UPDATE=1 rewrites the baseline with this run's numbers;
+BENCHMARK_SCALE multiplies the dataset (default 1), and BENCHMARK_ROUNDS
+sets the timed rounds per action (default 5).
+"""
+
+import json
+import os
+import statistics
+import time
+from datetime import time as clock
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from app.budget import refresh_budget
+from app.models import (
+    Attraction,
+    Column,
+    Post,
+    Trip,
+    VisitedAttraction,
+    position_step,
+)
+from users.models import User
+from users.tokens import PlannerRefreshToken
+
+BASELINE = Path(__file__).with_name("baseline.json")
+SCALE = int(os.environ.get("BENCHMARK_SCALE", "1"))
+ROUNDS = int(os.environ.get("BENCHMARK_ROUNDS", "5"))
+MARGIN = float(os.environ.get("BENCHMARK_MARGIN", "0.5"))
+# Absolute allowance on top of the margin, so actions of a few ms are not
+# failed by scheduler noise.
+SLACK_MS = float(os.environ.get("BENCHMARK_SLACK_MS", "5"))
+UPDATE = os.environ.get("BENCHMARK_UPDATE") == "1"
+
+# Per unit of scale.
+USERS = 2000
+POSTS = 3000
+# The benchmark user: many trips, and one big board.
+TRIPS = 50
+BOARD_COLUMNS = 30
+BOARD_CARDS = 40
+BOARD_VISITS = 300
+OWN_POSTS = 20
+
+results = {}
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("RUN_BENCHMARKS") == "1":
+        return
+    skip = pytest.mark.skip(reason="benchmarks run with RUN_BENCHMARKS=1")
+    for item in items:
+        if "benchmarks" in item.path.parts:
+            item.add_marker(skip)
+
+
+def trips_for(users, count, start):
+    return [
+        Trip(
+            destination=f"City {start + index}",
+            start_date=now() + timedelta(days=index),
+            start_time=clock(9),
+            end_date=now() + timedelta(days=index + 3),
+            end_time=clock(18),
+            owner=user,
+        )
+        for index, user in enumerate(users)
+        for _ in range(count)
+    ]
+
+
+def cards_for(columns, count):
+    step = position_step()
+    categories = [value for value, _ in Attraction.CATEGORY_CHOICES]
+    return [
+        Attraction(
+            column_id=column,
+            trip_id_id=column.trip_id_id,
+            owner_id=column.trip_id.owner_id,
+            title=f"Sight {index}",
+            location="Somewhere",
+            category=categories[index % len(categories)],
+            cost=Decimal(index % 50),
+            position=index * step,
+        )
+        for column in columns
+        for index in range(count)
+    ]
+
+
+def seed():
+    """
+    Bulk-insert the dataset and return the ids the benchmarks work on.
+    """
+    password = make_password("benchmark-password")
+    user = User.objects.create(
+        email="bench@example.com", name="Bench", password=password
+    )
+    others = User.objects.bulk_create(
+        User(email=f"user{index}@example.com", name=f"User {index}", password=password)
+        for index in range(USERS * SCALE)
+    )
+
+    # Everybody else: a trip with three days of four cards each.
+    trips = Trip.objects.bulk_create(trips_for(others, 1, 0))
+    columns = Column.objects.bulk_create(
+        Column(trip_id=trip, title=f"Day {day + 1}", position=day * position_step())
+        for trip in trips
+        for day in range(3)
+    )
+    Attraction.objects.bulk_create(cards_for(columns, 4), batch_size=2000)
+
+    # The benchmark user: many trips, the first one with a big board.
+    own_trips = Trip.objects.bulk_create(trips_for([user], TRIPS * SCALE, 0))
+    board = Column.objects.bulk_create(
+        Column(
+            trip_id=own_trips[0], title=f"Day {day + 1}", position=day * position_step()
+        )
+        for day in range(BOARD_COLUMNS)
+    )
+    cards = Attraction.objects.bulk_create(
+        cards_for(board, BOARD_CARDS), batch_size=2000
+    )
+    VisitedAttraction.objects.bulk_create(
+        VisitedAttraction(
+            attraction_id=card,
+            trip_id_id=card.trip_id_id,
+            owner=user,
+            moment="-",
+            reviewed_at=now(),
+            actualCost=card.cost,
+            rating=3,
+        )
+        for card in cards[:BOARD_VISITS]
+    )
+    refresh_budget(*(column.id for column in board))
+
+    # The first OWN_POSTS are the benchmark user's, to edit and delete.
+    authors = [user, *others]
+    posts = Post.objects.bulk_create(
+        Post(
+            author=user if index < OWN_POSTS else authors[index % len(authors)],
+            title=f"Post {index}",
+            content="Lorem ipsum " * 40,
+            slug=f"post-{index}",
+        )
+        for index in range(POSTS * SCALE)
+    )
+
+    return SimpleNamespace(
+        user_id=user.id,
+        trip=own_trips[0].id,
+        trips=[trip.id for trip in own_trips],
+        columns=[column.id for column in board],
+        cards=[card.id for card in cards],
+        visits=list(
+            VisitedAttraction.objects.filter(owner=user)
+            .order_by("id")
+            .values_list("id", flat=True)
+        ),
+        post=posts[0].slug,
+        posts=[post.slug for post in posts[:OWN_POSTS]],
+    )
+
+
+@pytest.fixture(scope="session")
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        return seed()
+
+
+@pytest.fixture
+def bench_client(db, dataset):
+    client = APIClient()
+    user = User.objects.get(pk=dataset.user_id)
+    token = PlannerRefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return client
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    if not BASELINE.exists():
+        return {"meta": {}, "actions": {}}
+    return json.loads(BASELINE.read_text())
+
+
+def meta():
+    return {"vendor": connection.vendor, "scale": SCALE}
+
+
+@pytest.fixture
+def bench(bench_client, dataset, baseline, settings, tmp_path):
+    """
+    bench(name, make_request): time ROUNDS calls of the request returned by
+    make_request(round) -> (method, path, data[, format]) and check them
+    against the baseline. The first call is a warm-up that also counts the
+    queries. Uploaded files go to a temporary MEDIA_ROOT.
+    """
+    settings.MEDIA_ROOT = tmp_path
+
+    def run(name, make_request):
+        def call(index):
+            method, path, data, *format = make_request(index)
+            started = time.perf_counter()
+            response = getattr(bench_client, method)(
+                path, data, format=format[0] if format else "json"
+            )
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+            assert response.status_code < 400, (name, response.status_code)
+            return elapsed
+
+        with CaptureQueriesContext(connection) as captured:
+            call(0)
+        # Read now: the next request clears the connection's query log.
+        queries = len(captured)
+        timings = [call(index) for index in range(1, ROUNDS + 1)]
+        result = {
+            "queries": queries,
+            "median_ms": round(statistics.median(timings) * 1000, 2),
+        }
+        results[name] = result
+
+        expected = baseline["actions"].get(name)
+        if UPDATE or expected is None:
+            return
+        assert result["queries"] <= expected["queries"], (
+            f"{name}: {result['queries']} queries, baseline {expected['queries']}"
+        )
+        if baseline["meta"] == meta():
+            limit = expected["median_ms"] * (1 + MARGIN) + SLACK_MS
+            assert result["median_ms"] <= limit, (
+                f"{name}: {result['median_ms']} ms, baseline "
+                f"{expected['median_ms']} ms (+{MARGIN:.0%} +{SLACK_MS} ms)"
+            )
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    for name, result in sorted(results.items()):
+        terminalreporter.write_line(
+            f"{name:<32} {result['queries']:>4} queries {result['median_ms']:>10.2f} ms"
+        )
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if UPDATE and results:
+        BASELINE.write_text(
+            json.dumps({"meta": meta(), "actions": results}, indent=2, sort_keys=True)
+            + "\n"
+        )
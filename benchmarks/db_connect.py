@@ -0,0 +1,96 @@
+"""
+Connect overhead: time the database part of many short requests with each
+connection reuse mode, against the database configured in .env.
+
+    python benchmarks/db_connect.py --requests 500
+
+Each mode runs in a fresh process with the matching environment:
+
+    none        DB_CONN_MAX_AGE=0: a new connection for every request
+    persistent  DB_CONN_MAX_AGE=60 with health checks
+    pool        DB_POOL_MAX_SIZE=4 (needs psycopg 3 with the pool extra)
+
+A request is simulated the way Django runs one: request_started, a
+`SELECT 1` (as cheap as a query gets, so the connect cost stands out),
+request_finished.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+MODES = {
+    "none": {"DB_CONN_MAX_AGE": "0", "DB_POOL_MAX_SIZE": "0"},
+    "persistent": {
+        "DB_CONN_MAX_AGE": "60",
+        "DB_CONN_HEALTH_CHECKS": "True",
+        "DB_POOL_MAX_SIZE": "0",
+    },
+    "pool": {"DB_POOL_MAX_SIZE": "4", "DB_POOL_MIN_SIZE": "1"},
+}
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure(requests):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "planner.settings")
+    import django
+
+    django.setup()
+    from django.core.signals import request_finished, request_started
+    from django.db import connection
+
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        request_started.send(sender=None)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+        request_finished.send(sender=None)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        latencies = measure(args.requests)
+        print(
+            f"{os.environ['BENCH_MODE']:>10}: {args.requests} requests, "
+            f"p50 {statistics.median(latencies) * 1000:.2f} ms, "
+            f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms, "
+            f"total {sum(latencies):.2f} s"
+        )
+        return
+
+    for mode in args.modes:
+        env = {**os.environ, **MODES[mode], "BENCH_MODE": mode}
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", "--requests", str(args.requests)],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            error = (result.stderr.strip().splitlines() or ["failed"])[-1]
+            print(f"{mode:>10}: skipped ({error})")
+        else:
+            print(result.stdout.rstrip())
+
+
+if __name__ == "__main__":
+    main()
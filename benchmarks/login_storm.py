@@ -0,0 +1,122 @@
+"""
+Login storm: fire many concurrent logins at a running server and measure the
+login throughput and the latency of an unrelated endpoint meanwhile.
+
+    # ASGI: logins hash on the bounded pool, the loop keeps serving
+    uvicorn planner.asgi:application --workers 2
+    # WSGI sync workers, for comparison
+    gunicorn planner.wsgi:application --workers 2
+
+    python benchmarks/login_storm.py --base-url http://127.0.0.1:8000
+
+The probe endpoint (the recent posts feed by default) is timed alone first,
+then again while the storm runs. Logins answered with 503 were turned away
+by admission control (PASSWORD_HASH_WORKERS / PASSWORD_HASH_BACKLOG).
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def request(url, payload=None):
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def probe(url, stop, latencies, interval):
+    while not stop.is_set():
+        latencies.append(request(url)[1])
+        time.sleep(interval)
+
+
+def report(name, latencies):
+    print(
+        f"{name}: {len(latencies)} requests, "
+        f"p50 {statistics.median(latencies) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", default="storm@example.com")
+    parser.add_argument("--password", default="storm-password-1")
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--probe-path", default="/api/posts/recent/")
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    parser.add_argument("--baseline-seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    base = args.base_url.rstrip("/")
+    credentials = {"email": args.email, "password": args.password}
+    # 201 on the first run, 400 (email taken) afterwards.
+    request(f"{base}/api/users/register", {**credentials, "name": "Storm"})
+
+    baseline = []
+    stop = threading.Event()
+    prober = threading.Thread(
+        target=probe,
+        args=(base + args.probe_path, stop, baseline, args.probe_interval),
+    )
+    prober.start()
+    time.sleep(args.baseline_seconds)
+    stop.set()
+    prober.join()
+
+    during = []
+    stop = threading.Event()
+    prober = threading.Thread(
+        target=probe,
+        args=(base + args.probe_path, stop, during, args.probe_interval),
+    )
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(
+            pool.map(
+                lambda _: request(f"{base}/api/users/login", credentials),
+                range(args.logins),
+            )
+        )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+
+    statuses = [status for status, _ in results]
+    ok = [latency for status, latency in results if status == 200]
+    print(
+        f"logins: {len(ok)} ok, {statuses.count(503)} rejected (503), "
+        f"{len(results) - len(ok) - statuses.count(503)} failed "
+        f"in {elapsed:.1f} s -> {len(ok) / elapsed:.1f} logins/s"
+    )
+    if ok:
+        report("login latency", ok)
+    report(f"{args.probe_path} alone", baseline)
+    report(f"{args.probe_path} during storm", during)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+One benchmark per API action. Each request factory gets the round number,
+so writes work on a different card or column every round.
+"""
+
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+
+def trip_payload():
+    return {
+        "destination": "Lisbon",
+        "start_date": "2030-05-01T00:00:00Z",
+        "start_time": "09:00",
+        "end_date": "2030-05-04T00:00:00Z",
+        "end_time": "18:00",
+    }
+
+
+def card_payload():
+    return {
+        "title": "Tower",
+        "location": "Belem",
+        "category": "landmark",
+        "cost": "10.00",
+    }
+
+
+def jpeg(index, name="photo.jpg"):
+    # A different image every round: uploads are stored by content.
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (index * 40 % 256, 80, 160)).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+ACTIONS = {
+    # Trips
+    "trip-list": lambda d, i: ("get", reverse("trip-list"), None),
+    "trip-detail": lambda d, i: ("get", reverse("trip-detail", args=[d.trip]), None),
+    "trip-create": lambda d, i: ("post", reverse("trip-list"), trip_payload()),
+    "trip-update": lambda d, i: (
+        "patch",
+        reverse("trip-detail", args=[d.trips[1]]),
+        {"destination": f"Porto {i}"},
+    ),
+    "trip-destroy": lambda d, i: (
+        "delete",
+        reverse("trip-detail", args=[d.trips[10 + i]]),
+        None,
+    ),
+    "trip-export": lambda d, i: (
+        "get",
+        reverse("trip-export", args=[d.trip]),
+        None,
+    ),
+    "trip-budget": lambda d, i: (
+        "get",
+        reverse("trip-budget", args=[d.trip]),
+        None,
+    ),
+    "trip-import-board": lambda d, i: (
+        "post",
+        reverse("trip-import-board", args=[d.trip]),
+        [
+            {
+                "title": "Imported",
+                "cards": [card_payload() for _ in range(10)],
+            }
+        ],
+    ),
+    # Columns
+    "column-list": lambda d, i: (
+        "get",
+        reverse("column-list") + f"?trip_id={d.trip}",
+        None,
+    ),
+    "column-create": lambda d, i: (
+        "post",
+        reverse("column-list"),
+        {"trip_id": d.trip, "title": "Extra day", "position": len(d.columns) + i},
+    ),
+    "column-update": lambda d, i: (
+        "patch",
+        reverse("column-detail", args=[d.columns[1]]),
+        {"title": f"Day two {i}"},
+    ),
+    # A day with its cards, visits and budget lines.
+    "column-destroy": lambda d, i: (
+        "delete",
+        reverse("column-detail", args=[d.columns[10 + i]]),
+        None,
+    ),
+    # Cards
+    "attraction-list": lambda d, i: ("get", reverse("attraction-list"), None),
+    "attraction-detail": lambda d, i: (
+        "get",
+        reverse("attraction-detail", args=[d.cards[0]]),
+        None,
+    ),
+    "attraction-create": lambda d, i: (
+        "post",
+        reverse("attraction-list"),
+        {"column_id": d.columns[0], **card_payload()},
+    ),
+    "attraction-update": lambda d, i: (
+        "patch",
+        reverse("attraction-detail", args=[d.cards[1]]),
+        {"title": f"Renamed {i}"},
+    ),
+    # To the top of another day, so the positions of both days shift.
+    "attraction-move": lambda d, i: (
+        "patch",
+        reverse("attraction-move", args=[d.cards[i]]),
+        {"column_id": d.columns[-1], "position": 0},
+    ),
+    "attraction-bulk-move": lambda d, i: (
+        "post",
+        reverse("attraction-bulk-move"),
+        {
+            "moves": [
+                {"id": card, "column_id": d.columns[-2], "position": 0}
+                for card in d.cards[100 + i * 10 : 110 + i * 10]
+            ]
+        },
+    ),
+    # Closes the gap with AttractionViewSet._reorder_column.
+    "attraction-destroy": lambda d, i: (
+        "delete",
+        reverse("attraction-detail", args=[d.cards[200 + i]]),
+        None,
+    ),
+    "grouped_attractions": lambda d, i: (
+        "get",
+        reverse("grouped_attractions-list") + f"?trip_id={d.trip}",
+        None,
+    ),
+    "async-grouped-attractions": lambda d, i: (
+        "get",
+        reverse("async-grouped-attractions") + f"?trip_id={d.trip}",
+        None,
+    ),
+    # Visits
+    "visited-list": lambda d, i: ("get", reverse("visited-list"), None),
+    "visited-detail": lambda d, i: (
+        "get",
+        reverse("visited-detail", args=[d.visits[0]]),
+        None,
+    ),
+    "visited-create": lambda d, i: (
+        "post",
+        reverse("visited-list"),
+        {
+            "attraction_id": d.cards[-1 - i],
+            "rating": 4,
+            "moment": "-",
+            "actualCost": "12.00",
+        },
+    ),
+    "visited-update": lambda d, i: (
+        "patch",
+        reverse("visited-detail", args=[d.visits[1]]),
+        {"actualCost": f"{20 + i}.00"},
+    ),
+    "visited-destroy": lambda d, i: (
+        "delete",
+        reverse("visited-detail", args=[d.visits[10 + i]]),
+        None,
+    ),
+    "visited-photos": lambda d, i: (
+        "get",
+        reverse("visited-photos", args=[d.visits[0]]),
+        None,
+    ),
+    "visited-photos-upload": lambda d, i: (
+        "post",
+        reverse("visited-photos", args=[d.visits[0]]),
+        {"photos": [jpeg(i, "a.jpg"), jpeg(i + 100, "b.jpg")]},
+        "multipart",
+    ),
+    # Posts
+    "posts-list": lambda d, i: ("get", reverse("posts-list"), None),
+    "posts-recent": lambda d, i: ("get", reverse("posts-recent"), None),
+    "posts-detail": lambda d, i: (
+        "get",
+        reverse("posts-detail", args=[d.post]),
+        None,
+    ),
+    "posts-create": lambda d, i: (
+        "post",
+        reverse("posts-list"),
+        {"title": f"Benchmark {i}", "content": "Lorem ipsum"},
+    ),
+    "posts-update": lambda d, i: (
+        "patch",
+        reverse("posts-detail", args=[d.posts[1]]),
+        {"content": f"Edited {i}"},
+    ),
+    "posts-destroy": lambda d, i: (
+        "delete",
+        reverse("posts-detail", args=[d.posts[2 + i]]),
+        None,
+    ),
+    # Uploads
+    "upload-image": lambda d, i: (
+        "post",
+        reverse("upload-image"),
+        {"image": jpeg(i)},
+        "multipart",
+    ),
+    # Users
+    "users-me": lambda d, i: ("get", "/api/users/user", None),
+}
+
+
+@pytest.mark.parametrize("name", ACTIONS)
+def test_action(bench, dataset, name):
+    bench(name, lambda index: ACTIONS[name](dataset, index))
@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "app.metrics.MetricsMiddleware",
+    "app.timing.ServerTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -84,12 +86,17 @@ TEMPLATES = [
 
 
 WSGI_APPLICATION = "planner.wsgi.application"
+ASGI_APPLICATION = "planner.asgi.application"
 
 if os.environ.get("GITHUB_ACTIONS") == "true":
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            # A file rather than the shared in-memory database, which locks
+            # whole tables: tests that write from several threads wait for
+            # each other's transactions instead of failing.
+            "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
         }
     }
 else:
@@ -101,10 +108,50 @@ else:
             "PASSWORD": os.environ.get("DB_PASSWORD"),
             "HOST": os.environ.get("DB_HOST", "localhost"),
             "PORT": os.environ.get("DB_PORT", "5432"),
+            # Seconds to keep a connection open between requests instead of
+            # paying a TCP connect and authentication each time; the health
+            # check replaces connections the server dropped meanwhile. Off
+            # by default: it only pays off under WSGI workers (e.g. 60 with
+            # gunicorn). Under ASGI, use the pool below instead.
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "0")),
+            "CONN_HEALTH_CHECKS": (
+                os.environ.get("DB_CONN_HEALTH_CHECKS", "True").lower() == "true"
+            ),
+        }
+    }
+
+    # Optional in-process pool (psycopg 3 with the pool extra, from
+    # requirements.txt). The way to reuse connections under ASGI, where
+    # persistent connections do not outlive the thread that served the
+    # request and are left idle instead.
+    # Sized per worker process: max size x workers must stay below the
+    # server's max_connections.
+    DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "0"))
+    if DB_POOL_MAX_SIZE:
+        DATABASES["default"]["CONN_MAX_AGE"] = 0  # the pool keeps them instead
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                "max_size": DB_POOL_MAX_SIZE,
+                "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            }
+        }
+
+# Shared cache. Needed as soon as more than one worker process serves the
+# API: the cached recent-posts feed and the version in the post listing
+# ETags live in the cache, and without it each process has its own
+# local-memory cache that the others' writes never invalidate.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
         }
     }
 
 
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator", # noqa: E501
@@ -143,20 +190,39 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
-    ),
+    "DEFAULT_AUTHENTICATION_CLASSES": ("users.authentication.ClaimsJWTAuthentication",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Page sizes of the cursor-paginated list endpoints (?page_size= overrides)
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", "50"))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", "200"))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
     "SLIDING_TOKEN_LIFETIME": timedelta(days=30),
     "SLIDING_TOKEN_REFRESH_LIFETIME_LATE_USER": timedelta(days=1),
     "SLIDING_TOKEN_LIFETIME_LATE_USER": timedelta(days=30),
+    # Tokens from /api/token/ carry the user claims too.
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.PlannerTokenObtainPairSerializer",
+    # Blacklist checks of refresh and verify go through the revoked JTI cache.
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.PlannerTokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER": "users.serializers.PlannerTokenVerifySerializer",
 }
 
+# Bearer token Prometheus scrapes /metrics with; the endpoint is off when empty.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Send a Server-Timing breakdown (auth, db, serialize...) with every response.
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "False").lower() == "true"
+
+# Blacklist lookups remembered per process (users.tokens.RevokedTokens).
+REVOKED_TOKEN_CACHE_SIZE = int(os.environ.get("REVOKED_TOKEN_CACHE_SIZE", "10000"))
+# Seconds a token found valid is not looked up again: a logout in another
+# process may take this long to be seen here. 0 looks up every time.
+REVOKED_TOKEN_VALID_TTL = int(os.environ.get("REVOKED_TOKEN_VALID_TTL", "30"))
+
 
 AUTHENTICATION_BACKENDS = ("django.contrib.auth.backends.ModelBackend",)
 
@@ -166,9 +232,26 @@ LOGIN_REDIRECT_URL = "/api/trip"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Largest accepted file upload, in bytes (checked while streaming).
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))
+
+# Threads that render resized post pictures; 0 renders them inline.
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+# Processes that decode and resize visit photos; 0 works in the calling thread.
+PHOTO_PROCESSES = int(os.environ.get("PHOTO_PROCESSES", str(os.cpu_count() or 1)))
+
 
 AUTH_USER_MODEL = "users.User"
 
+# Login and registration hash passwords on a pool of this many threads, with
+# at most PASSWORD_HASH_BACKLOG more waiting; past that they answer 503.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_BACKLOG = int(os.environ.get("PASSWORD_HASH_BACKLOG", "32"))
+
+# Ordering of columns and cards on the trip board: "dense" or "gapped"
+POSITION_MODE = os.environ.get("POSITION_MODE", "dense")
+POSITION_GAP = int(os.environ.get("POSITION_GAP", "1024"))
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "Planner API",
     "DESCRIPTION": "API documentation for the Planner project",
@@ -2,14 +2,22 @@ from datetime import timedelta
 
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils.timezone import now
 from rest_framework.test import APIClient
 
 from app.models import Column, Trip
+from users.tokens import PlannerRefreshToken
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Cached payloads outlive the per-test database rollback.
+    cache.clear()
+
+
 @pytest.fixture
 def api_client():
     return APIClient()
@@ -31,6 +39,14 @@ def auth_client(api_client, user):
     return api_client
 
 
+@pytest.fixture
+def bearer_client(api_client, user):
+    # Authenticates like a real client, for views outside DRF (app.async_views).
+    token = PlannerRefreshToken.for_user(user).access_token
+    api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    return api_client
+
+
 @pytest.fixture
 def trip(user):
     return Trip.objects.create(
@@ -1,5 +1,15 @@
+import time
+from datetime import timedelta
+
 import pytest
 from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from app.models import Attraction, Column, Trip
+from users.authentication import ClaimsJWTAuthentication
+from users.hashing import hashing_pool
+from users.models import User
+from users.tokens import PlannerRefreshToken, RevokedTokens, revoked_tokens
 
 
 @pytest.mark.django_db
@@ -7,3 +17,240 @@ def test_get_trips_list(auth_client, trip):
     url = reverse("trip-list")
     response = auth_client.get(url)
     assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_trip_list_is_cursor_paginated(auth_client, user, trip):
+    for i in range(4):
+        Trip.objects.create(
+            destination=f"Trip {i}",
+            start_date=trip.start_date + timedelta(days=i + 1),
+            start_time="10:00",
+            end_date=trip.end_date + timedelta(days=i + 1),
+            end_time="12:00",
+            owner=user,
+        )
+
+    url = f"{reverse('trip-list')}?page_size=2"
+    seen = []
+    while url:
+        page = auth_client.get(url).json()
+        assert len(page["results"]) <= 2
+        seen += [item["destination"] for item in page["results"]]
+        url = page["next"]
+
+    assert seen == ["Trip 3", "Trip 2", "Trip 1", "Trip 0", "Paris"]
+
+
+@pytest.mark.django_db
+def test_attraction_pages_follow_board_order(auth_client, trip, column):
+    day2 = Column.objects.create(trip_id=trip, title="Day 2", position=1)
+    for col in (day2, column):
+        for i in range(3):
+            Attraction.objects.create(
+                column_id=col, title=f"{col.title} #{i}", location="X", cost=0
+            )
+
+    url = f"{reverse('attraction-list')}?page_size=4"
+    first = auth_client.get(url).json()
+    second = auth_client.get(first["next"]).json()
+
+    titles = [item["title"] for item in first["results"] + second["results"]]
+    assert titles == [f"Day 1 #{i}" for i in range(3)] + [
+        f"Day 2 #{i}" for i in range(3)
+    ]
+    assert second["next"] is None
+
+
+@pytest.mark.django_db
+def test_attraction_pages_walk_a_long_column_both_ways(auth_client, column):
+    cards = [
+        Attraction.objects.create(column_id=column, title=f"#{i}", location="X", cost=0)
+        for i in range(7)
+    ]
+    # Same position as its neighbour, and no position at all.
+    Attraction.objects.filter(pk=cards[3].pk).update(position=2)
+    Attraction.objects.filter(pk=cards[6].pk).update(position=None)
+    expected = [f"#{i}" for i in range(7)]
+
+    url = f"{reverse('attraction-list')}?page_size=2"
+    forward, pages = [], []
+    while url:
+        page = auth_client.get(url).json()
+        forward += [item["title"] for item in page["results"]]
+        pages.append(page)
+        url = page["next"]
+    assert forward == expected
+
+    backward = []
+    url = pages[-1]["previous"]
+    while url:
+        page = auth_client.get(url).json()
+        backward = [item["title"] for item in page["results"]] + backward
+        url = page["previous"]
+    assert backward + forward[-len(pages[-1]["results"]) :] == expected
+
+
+@pytest.mark.django_db
+class TestAsyncSignIn:
+    def test_register_then_login(self, client):
+        response = client.post(
+            "/api/users/register",
+            {"email": "new@test.com", "name": "Ana", "password": "s3cret-pass"},
+            content_type="application/json",
+        )
+        assert response.status_code == 201
+        body = response.json()
+        assert body["user"]["email"] == "new@test.com"
+        assert "password" not in body["user"]
+        assert body["access"] and body["refresh"]
+        assert User.objects.get(email="new@test.com").check_password("s3cret-pass")
+
+        response = client.post(
+            "/api/users/login",
+            {"email": "new@test.com", "password": "s3cret-pass"},
+            content_type="application/json",
+        )
+        assert response.status_code == 200
+        assert set(response.json()) == {"access", "refresh"}
+
+    def test_wrong_password_and_unknown_email(self, client, user):
+        for email, password in [(user.email, "nope"), ("ghost@test.com", "x")]:
+            response = client.post(
+                "/api/users/login", {"email": email, "password": password}
+            )
+            assert response.status_code == 401
+
+    def test_register_validation_errors(self, client, user):
+        response = client.post(
+            "/api/users/register",
+            {"email": user.email, "name": "Dup", "password": "x"},
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+        assert "email" in response.json()
+
+    def test_full_pool_answers_503(self, client, user, settings):
+        pool = hashing_pool()
+        held = 0
+        while pool.slots.acquire(blocking=False):
+            held += 1
+        try:
+            response = client.post(
+                "/api/users/login",
+                {"email": user.email, "password": "password"},
+                content_type="application/json",
+            )
+        finally:
+            for _ in range(held):
+                pool.slots.release()
+
+        assert response.status_code == 503
+        assert response["Retry-After"] == "1"
+
+
+@pytest.mark.django_db
+class TestClaimsAuthentication:
+    def bearer(self, api_client, token):
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return api_client
+
+    def test_request_user_costs_no_query(
+        self, api_client, user, trip, django_assert_num_queries
+    ):
+        token = PlannerRefreshToken.for_user(user).access_token
+        client = self.bearer(api_client, token)
+        with django_assert_num_queries(1):  # the trips, not the user
+            response = client.get(reverse("trip-list"))
+        assert response.status_code == 200
+        assert [t["id"] for t in response.json()["results"]] == [trip.id]
+
+    def test_deferred_fields_load_in_one_query(self, user, django_assert_num_queries):
+        token = PlannerRefreshToken.for_user(user).access_token
+        built = ClaimsJWTAuthentication().get_user(token)
+        assert (built.pk, built.email, built.name) == (user.pk, user.email, user.name)
+
+        with django_assert_num_queries(1):
+            assert built.is_active
+            assert built.date_joined == user.date_joined
+            assert built.last_login == user.last_login
+
+    def test_tokens_without_claims_still_work(self, api_client, user, trip):
+        client = self.bearer(api_client, RefreshToken.for_user(user).access_token)
+        response = client.get(reverse("trip-list"))
+        assert response.status_code == 200
+
+    def test_login_tokens_carry_claims(self, client, user):
+        response = client.post(
+            "/api/users/login",
+            {"email": user.email, "password": "password"},
+            content_type="application/json",
+        )
+        token = AccessToken(response.json()["access"])
+        assert (token["email"], token["name"]) == (user.email, user.name)
+
+
+@pytest.mark.django_db
+class TestTokenRevocation:
+    def test_logged_out_token_is_refused_without_a_query(
+        self, auth_client, user, django_assert_num_queries
+    ):
+        refresh = str(PlannerRefreshToken.for_user(user))
+        response = auth_client.post(
+            "/api/users/logout", {"refresh": refresh}, format="json"
+        )
+        assert response.status_code == 205
+
+        # Known to this process since the logout: no blacklist lookup.
+        with django_assert_num_queries(0):
+            response = auth_client.post(
+                reverse("token_refresh"), {"refresh": refresh}, format="json"
+            )
+        assert response.status_code == 401
+
+    def test_revoked_elsewhere_is_seen_and_remembered(self, api_client, user):
+        refresh = PlannerRefreshToken.for_user(user)
+        # Blacklisted by another process: not in this process' cache yet.
+        RefreshToken.blacklist(refresh)
+        assert refresh["jti"] not in revoked_tokens
+
+        response = api_client.post(
+            reverse("token_verify"), {"token": str(refresh)}, format="json"
+        )
+        assert response.status_code == 400
+        assert refresh["jti"] in revoked_tokens
+
+    def test_valid_lookup_is_remembered_for_a_while(
+        self, api_client, user, monkeypatch, django_assert_num_queries
+    ):
+        refresh = PlannerRefreshToken.for_user(user)
+        url = reverse("token_verify")
+        response = api_client.post(url, {"token": str(refresh)}, format="json")
+        assert response.status_code == 200
+
+        RefreshToken.blacklist(refresh)  # by another process
+        with django_assert_num_queries(0):
+            response = api_client.post(url, {"token": str(refresh)}, format="json")
+        assert response.status_code == 200
+
+        clock = time.monotonic() + revoked_tokens.valid_ttl
+        monkeypatch.setattr("users.tokens.time.monotonic", lambda: clock)
+        response = api_client.post(url, {"token": str(refresh)}, format="json")
+        assert response.status_code == 400
+
+    def test_valid_token_refreshes(self, api_client, user):
+        refresh = str(PlannerRefreshToken.for_user(user))
+        response = api_client.post(
+            reverse("token_refresh"), {"refresh": refresh}, format="json"
+        )
+        assert response.status_code == 200
+        assert AccessToken(response.json()["access"])["email"] == user.email
+
+    def test_lru_evicts_least_recently_used(self):
+        revoked = RevokedTokens(maxsize=2)
+        revoked.add("a")
+        revoked.add("b")
+        assert "a" in revoked  # now the most recently used
+        revoked.add("c")
+        assert "b" not in revoked
+        assert "a" in revoked and "c" in revoked
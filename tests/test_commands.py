@@ -0,0 +1,148 @@
+import io
+import json
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.utils.timezone import now
+from PIL import Image
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+from app.checks import shared_cache_check
+from app.models import Attraction, Blob, VisitedAttraction, VisitPhoto
+from app.storage import blob_storage
+from users.tokens import PlannerRefreshToken
+
+
+@pytest.mark.django_db
+def test_explain_querysets_covers_every_list(user, column):
+    out = StringIO()
+    call_command("explain_querysets", user=user.email, stdout=out)
+
+    reported = [line.split(":")[0] for line in out.getvalue().splitlines()]
+    assert reported == [
+        "trip-list",
+        "column-list",
+        "attraction-list",
+        "visited-list",
+        "posts-list",
+        "grouped_attractions-version",
+        "grouped_attractions-list",
+        "posts-recent",
+    ]
+
+
+@pytest.mark.django_db
+def test_import_trip_from_file(trip, tmp_path):
+    path = tmp_path / "board.json"
+    path.write_text(
+        json.dumps(
+            [
+                {
+                    "title": "Day 1",
+                    "cards": [{"title": "Louvre", "location": "Paris", "cost": 20}],
+                }
+            ]
+        )
+    )
+
+    call_command("import_trip", str(path), trip=trip.id, stdout=StringIO())
+
+    assert Attraction.objects.get().column_id.trip_id == trip
+
+
+@pytest.mark.django_db
+def test_gc_blobs_deletes_orphans(settings, tmp_path, column):
+    settings.MEDIA_ROOT = tmp_path
+    attraction = Attraction.objects.create(
+        column_id=column, title="Louvre", location="Paris", cost=0
+    )
+    visit = VisitedAttraction.objects.create(
+        attraction_id=attraction,
+        moment="-",
+        reviewed_at=now(),
+        actualCost=10,
+        images=ContentFile(b"kept", name="kept.jpg"),
+    )
+    orphan = blob_storage.save("orphan.jpg", ContentFile(b"orphan"))
+    fresh = blob_storage.save("fresh.jpg", ContentFile(b"fresh"))
+    Blob.objects.exclude(name=fresh).update(
+        refcount=3, last_used_at=now() - timedelta(days=2)
+    )
+
+    call_command("gc_blobs", stdout=StringIO())
+
+    # Refcounts are recounted from the file fields; only the old
+    # unreferenced blob goes, the fresh upload is still in its grace period.
+    assert set(Blob.objects.values_list("name", "refcount")) == {
+        (visit.images.name, 1),
+        (fresh, 0),
+    }
+    assert not blob_storage.exists(orphan)
+    assert blob_storage.exists(visit.images.name)
+    assert blob_storage.exists(fresh)
+
+
+@pytest.mark.django_db
+def test_process_photos_drains_queue(settings, tmp_path, column):
+    settings.MEDIA_ROOT = tmp_path
+    settings.PHOTO_PROCESSES = 2
+    attraction = Attraction.objects.create(
+        column_id=column, title="Louvre", location="Paris", cost=0
+    )
+    visit = VisitedAttraction.objects.create(
+        attraction_id=attraction, moment="-", reviewed_at=now(), actualCost=10
+    )
+    buffer = io.BytesIO()
+    Image.new("RGB", (800, 600), "green").save(buffer, "JPEG")
+    name = blob_storage.save("photo.jpg", ContentFile(buffer.getvalue()))
+    VisitPhoto.objects.bulk_create(
+        [VisitPhoto(visit=visit, original=name) for _ in range(3)]
+    )
+
+    call_command("process_photos", once=True, stdout=StringIO())
+
+    assert set(VisitPhoto.objects.values_list("status", flat=True)) == {"ready"}
+
+
+@pytest.mark.django_db
+def test_prune_tokens_deletes_expired_in_chunks(user):
+    tokens = [PlannerRefreshToken.for_user(user) for _ in range(5)]
+    for token in tokens[:2]:
+        token.blacklist()
+    expired = [token["jti"] for token in tokens[1:4]]
+    OutstandingToken.objects.filter(jti__in=expired).update(
+        expires_at=now() - timedelta(minutes=1)
+    )
+
+    out = StringIO()
+    call_command("prune_tokens", chunk=2, stdout=out)
+
+    assert "Deleted 3 expired tokens." in out.getvalue()
+    assert set(OutstandingToken.objects.values_list("jti", flat=True)) == {
+        tokens[0]["jti"],
+        tokens[4]["jti"],
+    }
+    assert list(BlacklistedToken.objects.values_list("token__jti", flat=True)) == [
+        tokens[0]["jti"]
+    ]
+
+
+def test_deploy_check_asks_for_a_shared_cache(settings):
+    settings.CACHES = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    }
+    assert [w.id for w in shared_cache_check(None)] == ["app.W001"]
+
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://localhost:6379/0",
+        }
+    }
+    assert shared_cache_check(None) == []
@@ -1,10 +1,18 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
+from PIL import Image
 from rest_framework.exceptions import ValidationError
 
-from app.models import Attraction, Post, Trip
+from app.models import Attraction, Column, Post, Trip, VisitedAttraction
+from app.serializers import PostSerializer
 
 
 @pytest.mark.django_db
@@ -35,6 +43,65 @@ class TestAttractionLogic:
         assert a1.position == 0
         assert a2.position == 1
 
+    def test_trip_and_owner_copied_from_column(self, user, other_user, column):
+        attraction = Attraction.objects.create(
+            column_id=column, title="A1", location="L", cost=10
+        )
+        assert attraction.trip_id == column.trip_id
+        assert attraction.owner == user
+
+        other_trip = Trip.objects.create(
+            destination="Rome",
+            start_date=now(),
+            start_time="10:00",
+            end_date=now() + timedelta(days=2),
+            end_time="12:00",
+            owner=user,
+        )
+        other_column = Column.objects.create(trip_id=other_trip, position=0)
+        visit = VisitedAttraction.objects.create(
+            attraction_id=attraction, moment="-", reviewed_at=now(), actualCost=5
+        )
+        assert visit.trip_id == column.trip_id
+
+        attraction = Attraction.objects.get(pk=attraction.pk)
+        attraction.column_id = other_column
+        attraction.save()
+        visit.refresh_from_db()
+        assert visit.trip_id == other_trip
+
+        other_trip.owner = other_user
+        other_trip.save()
+        attraction.refresh_from_db()
+        visit.refresh_from_db()
+        assert attraction.owner == other_user
+        assert visit.owner == other_user
+
+    def test_cards_follow_their_column_to_another_trip(self, other_user, trip, column):
+        attraction = Attraction.objects.create(
+            column_id=column, title="A1", location="L", cost=10
+        )
+        visit = VisitedAttraction.objects.create(
+            attraction_id=attraction, moment="-", reviewed_at=now(), actualCost=5
+        )
+        other_trip = Trip.objects.create(
+            destination="Rome",
+            start_date=now(),
+            start_time="10:00",
+            end_date=now() + timedelta(days=2),
+            end_time="12:00",
+            owner=other_user,
+        )
+
+        column = Column.objects.get(pk=column.pk)
+        column.trip_id = other_trip
+        column.save()
+
+        attraction.refresh_from_db()
+        visit.refresh_from_db()
+        assert (attraction.trip_id, attraction.owner) == (other_trip, other_user)
+        assert (visit.trip_id, visit.owner) == (other_trip, other_user)
+
     def test_negative_cost(self, column):
         attraction = Attraction(
             column_id=column, title="Free Money", location="L", cost=-50
@@ -54,3 +121,108 @@ class TestPostLogic:
         assert p2.slug == "my-trip1"
         p3 = Post.objects.create(author=user, title="My Trip", content="Content C")
         assert p3.slug == "my-trip2"
+
+    def test_slug_lookup_does_not_grow_with_duplicates(self, user):
+        for _ in range(10):
+            Post.objects.create(author=user, title="Athens", content="-")
+
+        with CaptureQueriesContext(connection) as queries:
+            post = Post.objects.create(author=user, title="Athens", content="-")
+
+        assert post.slug == "athens10"
+        selects = [q for q in queries if q["sql"].startswith("SELECT")]
+        assert len(selects) == 1
+
+    def test_retries_when_slug_is_taken_concurrently(self, user, monkeypatch):
+        Post.objects.create(author=user, title="Naxos", content="-")
+        # Simulate a concurrent save winning the race for "naxos1".
+        Post.objects.create(author=user, title="Other", content="-", slug="naxos1")
+        picks = iter(["naxos1"])
+        original = Post.next_free_slug
+        monkeypatch.setattr(
+            Post,
+            "next_free_slug",
+            staticmethod(lambda base, skip=0: next(picks, None) or original(base)),
+        )
+
+        post = Post.objects.create(author=user, title="Naxos", content="-")
+        assert post.slug == "naxos2"
+
+    def test_picture_renditions(
+        self, user, settings, tmp_path, django_capture_on_commit_callbacks
+    ):
+        settings.MEDIA_ROOT = tmp_path
+        settings.IMAGE_WORKERS = 0
+        exif = Image.Exif()
+        exif[0x010F] = "Camera"  # Make
+        buffer = io.BytesIO()
+        Image.new("RGB", (1000, 500), "red").save(buffer, "JPEG", exif=exif)
+        picture = SimpleUploadedFile("beach.jpg", buffer.getvalue())
+
+        with django_capture_on_commit_callbacks(execute=True):
+            post = Post.objects.create(
+                author=user, title="Beach", content="-", picture=picture
+            )
+
+        post.refresh_from_db()
+        assert sorted(post.renditions) == ["320", "640"]
+        for width, names in post.renditions.items():
+            assert sorted(names) == ["jpeg", "webp"]
+            for name in names.values():
+                with default_storage.open(name) as f, Image.open(f) as image:
+                    assert image.width == int(width)
+                    assert not image.getexif()
+
+        srcset = PostSerializer(post).data["picture_srcset"]
+        assert srcset["webp"] == (
+            f"/media/{post.renditions['320']['webp']} 320w, "
+            f"/media/{post.renditions['640']['webp']} 640w"
+        )
+
+    def test_replaced_renditions_are_deleted(
+        self, user, settings, tmp_path, django_capture_on_commit_callbacks
+    ):
+        settings.MEDIA_ROOT = tmp_path
+        settings.IMAGE_WORKERS = 0
+
+        def picture(name):
+            buffer = io.BytesIO()
+            Image.new("RGB", (800, 400), "blue").save(buffer, "JPEG")
+            return SimpleUploadedFile(name, buffer.getvalue())
+
+        def files(renditions):
+            return [name for names in renditions.values() for name in names.values()]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            post = Post.objects.create(
+                author=user, title="Sea", content="-", picture=picture("sea.jpg")
+            )
+        old = files(Post.objects.get(pk=post.pk).renditions)
+        assert old and all(default_storage.exists(name) for name in old)
+
+        post = Post.objects.get(pk=post.pk)
+        with django_capture_on_commit_callbacks(execute=True):
+            post.picture = picture("sky.jpg")
+            post.save()
+        assert not any(default_storage.exists(name) for name in old)
+        new = files(Post.objects.get(pk=post.pk).renditions)
+        assert new and all(default_storage.exists(name) for name in new)
+
+        post = Post.objects.get(pk=post.pk)
+        with django_capture_on_commit_callbacks(execute=True):
+            post.delete()
+        assert not any(default_storage.exists(name) for name in new)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_posts_get_unique_slugs(user):
+    def create(index):
+        try:
+            return Post.objects.create(author=user, title="Brussels", content="-").slug
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        slugs = list(pool.map(create, range(12)))
+
+    assert len(set(slugs)) == 12
@@ -0,0 +1,42 @@
+import pytest
+from rest_framework.test import APIRequestFactory
+
+from app.models import Attraction, Column
+from app.ownership import is_owner, resolve_owner_id
+
+
+@pytest.mark.django_db
+class TestOwnershipResolver:
+    def test_uses_select_related_chain(self, user, column, django_assert_num_queries):
+        column = Column.objects.select_related("trip_id").get(pk=column.pk)
+
+        with django_assert_num_queries(0):
+            assert resolve_owner_id(column) == user.id
+
+    def test_single_query_without_select_related(
+        self, user, column, django_assert_num_queries
+    ):
+        column = Column.objects.get(pk=column.pk)
+
+        with django_assert_num_queries(1):
+            assert resolve_owner_id(column) == user.id
+
+    def test_denormalized_owner_needs_no_query(
+        self, user, column, django_assert_num_queries
+    ):
+        Attraction.objects.create(column_id=column, title="A", location="X", cost=0)
+        attraction = Attraction.objects.get()
+
+        with django_assert_num_queries(0):
+            assert resolve_owner_id(attraction) == user.id
+
+    def test_memoized_per_request(
+        self, user, other_user, column, django_assert_num_queries
+    ):
+        request = APIRequestFactory().get("/")
+        column = Column.objects.get(pk=column.pk)
+
+        with django_assert_num_queries(1):
+            assert is_owner(user, column, request)
+            assert is_owner(user, column, request)
+            assert not is_owner(other_user, column, request)
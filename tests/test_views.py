@@ -1,7 +1,26 @@
+import io
+import json
+
 import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-
-from app.models import Attraction, Column, Post
+from django.utils.timezone import now
+from PIL import Image
+
+from app.metrics import registry
+from app.models import (
+    Attraction,
+    Blob,
+    BudgetLine,
+    Column,
+    Post,
+    Trip,
+    VisitedAttraction,
+    VisitPhoto,
+)
+from users.tokens import PlannerRefreshToken
 
 
 @pytest.mark.django_db
@@ -46,6 +65,393 @@ class TestAttractionFlow:
         assert a1.position == 1
         assert a2.position == 2
 
+    def test_cannot_move_into_others_column(self, auth_client, other_user, column):
+        card = Attraction.objects.create(
+            column_id=column, title="A", location="X", cost=0
+        )
+        other_trip = Trip.objects.create(
+            destination="Rome",
+            start_date=now(),
+            start_time="10:00",
+            end_date=now(),
+            end_time="12:00",
+            owner=other_user,
+        )
+        other_column = Column.objects.create(trip_id=other_trip, position=0)
+        url = reverse("attraction-move", args=[card.id])
+
+        response = auth_client.patch(url, {"column_id": other_column.id})
+        assert response.status_code == 400
+        response = auth_client.patch(url, {"column_id": "x"})
+        assert response.status_code == 400
+
+        card.refresh_from_db()
+        assert (card.column_id, card.owner) == (column, column.trip_id.owner)
+
+    def test_delete_closes_gap(self, auth_client, column):
+        """Deleting a card renumbers the column without a write per card"""
+        cards = [
+            Attraction.objects.create(
+                column_id=column, title=f"A{i}", location="X", cost=0
+            )
+            for i in range(30)
+        ]
+
+        url = reverse("attraction-detail", args=[cards[0].id])
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.delete(url)
+        assert response.status_code == 204
+
+        # The renumbering, then the card count on its budget line.
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        assert len(updates) == 2
+        positions = list(
+            Attraction.objects.filter(column_id=column).values_list(
+                "position", flat=True
+            )
+        )
+        assert positions == list(range(29))
+
+
+@pytest.mark.django_db
+class TestBulkMove:
+    def test_moves_several_cards_in_one_request(self, auth_client, column, trip):
+        day2 = Column.objects.create(trip_id=trip, title="Day 2", position=1)
+        a, b, c = (
+            Attraction.objects.create(column_id=column, title=t, location="X", cost=0)
+            for t in "ABC"
+        )
+        d = Attraction.objects.create(column_id=day2, title="D", location="X", cost=0)
+
+        moves = [
+            {"id": c.id, "column_id": column.id, "position": 0},
+            {"id": a.id, "column_id": day2.id, "position": 0},
+        ]
+        url = reverse("attraction-bulk-move")
+        response = auth_client.post(url, {"moves": moves}, format="json")
+
+        assert response.status_code == 200
+        board = {col["id"]: col["cards"] for col in response.json()}
+        assert [card["title"] for card in board[str(column.id)]] == ["C", "B"]
+        assert [card["title"] for card in board[str(day2.id)]] == ["A", "D"]
+        assert [card["position"] for card in board[str(column.id)]] == [0, 1]
+        d.refresh_from_db()
+        assert d.position == 1
+        b.refresh_from_db()
+        assert b.position == 1
+
+    def test_cannot_move_others_cards(self, api_client, other_user, column):
+        card = Attraction.objects.create(
+            column_id=column, title="A", location="X", cost=0
+        )
+        api_client.force_authenticate(user=other_user)
+
+        moves = [{"id": card.id, "column_id": column.id, "position": 0}]
+        url = reverse("attraction-bulk-move")
+        response = api_client.post(url, {"moves": moves}, format="json")
+
+        assert response.status_code == 403
+
+
+@pytest.mark.django_db
+class TestGappedPositions:
+    @pytest.fixture(autouse=True)
+    def gapped(self, settings):
+        settings.POSITION_MODE = "gapped"
+        settings.POSITION_GAP = 4
+
+    def make_cards(self, column, *titles):
+        return [
+            Attraction.objects.create(
+                column_id=column, title=title, location="X", cost=0
+            )
+            for title in titles
+        ]
+
+    def test_list_positions_span_pages(self, auth_client, column):
+        cards = self.make_cards(column, "A", "B", "C", "D", "E")
+        url = reverse("attraction-list") + "?page_size=2"
+
+        pages = []
+        while url:
+            data = auth_client.get(url).json()
+            pages.append([(card["id"], card["position"]) for card in data["results"]])
+            url = data["next"]
+
+        assert pages == [
+            [(cards[0].id, 0), (cards[1].id, 1)],
+            [(cards[2].id, 2), (cards[3].id, 3)],
+            [(cards[4].id, 4)],
+        ]
+
+    def test_move_writes_only_the_moved_card(self, auth_client, column):
+        a1, a2, a3 = self.make_cards(column, "A", "B", "C")
+        assert [a1.position, a2.position, a3.position] == [0, 4, 8]
+
+        url = reverse("attraction-move", args=[a3.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.patch(url, {"column_id": column.id, "position": 1})
+
+        assert response.status_code == 200
+        assert response.data["position"] == 1
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        assert len(updates) == 1
+        a1.refresh_from_db()
+        a2.refresh_from_db()
+        assert [a1.position, a2.position] == [0, 4]
+
+    def test_rebalances_when_gap_runs_out(self, auth_client, column, trip):
+        self.make_cards(column, "first", "last")
+        day2 = Column.objects.create(trip_id=trip, title="Day 2", position=1)
+
+        # Each card lands between "first" and the previous newcomer,
+        # halving the gap until the column has to be spread out again.
+        for card in self.make_cards(day2, "n0", "n1", "n2"):
+            url = reverse("attraction-move", args=[card.id])
+            response = auth_client.patch(url, {"column_id": column.id, "position": 1})
+            assert response.status_code == 200
+
+        url = reverse("grouped_attractions-list")
+        data = auth_client.get(f"{url}?trip_id={trip.id}").json()
+        cards = next(item for item in data if item["id"] == str(column.id))["cards"]
+
+        assert [card["title"] for card in cards] == ["first", "n2", "n1", "n0", "last"]
+        assert [card["position"] for card in cards] == [0, 1, 2, 3, 4]
+
+    def test_column_inserted_by_index(self, auth_client, column, trip):
+        url = reverse("column-list")
+        response = auth_client.post(
+            url, {"trip_id": trip.id, "title": "Day 0", "position": 0}
+        )
+        assert response.status_code == 201
+        assert response.data["position"] == 0
+
+        response = auth_client.get(f"{url}?trip_id={trip.id}")
+        assert [(c["title"], c["position"]) for c in response.data] == [
+            ("Day 0", 0),
+            ("Day 1", 1),
+        ]
+
+        url = reverse("column-detail", args=[response.data[0]["id"]])
+        response = auth_client.patch(url, {"position": 1})
+        assert response.status_code == 200
+        assert response.data["position"] == 1
+
+    def test_card_create_and_update_take_an_index(self, auth_client, column):
+        self.make_cards(column, "A", "B", "C")
+        card = {"column_id": column.id, "location": "X", "cost": "0"}
+        url = reverse("attraction-list")
+
+        response = auth_client.post(url, {**card, "title": "N"})
+        detail = reverse("attraction-detail", args=[response.data["id"]])
+        response = auth_client.patch(detail, {"position": 2})
+        assert response.status_code == 200
+
+        response = auth_client.post(url, {**card, "title": "M", "position": 1})
+        assert response.status_code == 201
+        assert response.data["position"] == 1
+
+        titles = Attraction.objects.order_by("position").values_list("title", flat=True)
+        assert list(titles) == ["A", "M", "B", "N", "C"]
+
+
+@pytest.mark.django_db
+class TestTripExport:
+    def test_streams_the_whole_board(self, auth_client, trip, column):
+        attraction = Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=20
+        )
+        VisitedAttraction.objects.create(
+            attraction_id=attraction, moment="Busy", reviewed_at=now(), actualCost=22
+        )
+
+        response = auth_client.get(reverse("trip-export", args=[trip.id]))
+
+        assert response.status_code == 200
+        assert response.streaming
+        lines = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        assert [line["type"] for line in lines] == [
+            "trip",
+            "column",
+            "attraction",
+            "visit",
+        ]
+        assert lines[0]["data"]["destination"] == "Paris"
+        assert lines[2]["data"]["column_id"] == column.id
+        assert lines[3]["data"]["actualCost"] == "22.00"
+
+    def test_cannot_export_others_trip(self, api_client, other_user, trip):
+        api_client.force_authenticate(user=other_user)
+        response = api_client.get(reverse("trip-export", args=[trip.id]))
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestTripImport:
+    def board(self, columns, cards):
+        return [
+            {
+                "title": f"Day {day}",
+                "cards": [
+                    {"title": f"Stop {i}", "location": "X", "cost": "1.50"}
+                    for i in range(cards)
+                ],
+            }
+            for day in range(columns)
+        ]
+
+    def test_imports_board_in_a_few_statements(self, auth_client, trip, column):
+        url = reverse("trip-import-board", args=[trip.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = auth_client.post(url, self.board(4, 50), format="json")
+
+        assert response.status_code == 201
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        # Columns, cards (batched by the backend) and the budget lines.
+        assert len(inserts) <= 5
+        assert Column.objects.filter(trip_id=trip).count() == 5
+        assert Attraction.objects.filter(trip_id=trip, owner=trip.owner).count() == 200
+
+        imported = response.json()
+        assert [col["title"] for col in imported] == [f"Day {d}" for d in range(4)]
+        positions = [card["position"] for card in imported[0]["cards"]]
+        assert positions == list(range(50))
+
+    def test_rejects_invalid_document_up_front(self, auth_client, trip):
+        board = self.board(2, 3)
+        board[1]["cards"][2]["cost"] = "-5"
+
+        url = reverse("trip-import-board", args=[trip.id])
+        response = auth_client.post(url, board, format="json")
+
+        assert response.status_code == 400
+        assert not Column.objects.filter(trip_id=trip).exists()
+
+
+@pytest.mark.django_db
+class TestTripBudget:
+    def test_totals_per_day_and_category(
+        self, auth_client, trip, column, django_assert_num_queries
+    ):
+        day2 = Column.objects.create(trip_id=trip, title="Day 2", position=1)
+        Column.objects.create(trip_id=trip, title="Day 3", position=2)
+        louvre = Attraction.objects.create(
+            column_id=column,
+            title="Louvre",
+            location="Paris",
+            cost=20,
+            category="museum",
+        )
+        Attraction.objects.create(
+            column_id=column,
+            title="Orsay",
+            location="Paris",
+            cost="16.50",
+            category="museum",
+        )
+        Attraction.objects.create(
+            column_id=day2,
+            title="Bistro",
+            location="Paris",
+            cost=35,
+            category="restaurant",
+        )
+        VisitedAttraction.objects.create(
+            attraction_id=louvre, moment="-", reviewed_at=now(), actualCost=22
+        )
+
+        url = reverse("trip-budget", args=[trip.id])
+        # The trip lookup, then the budget itself.
+        with django_assert_num_queries(2):
+            data = auth_client.get(url).data
+
+        assert (data["planned"], data["actual"], data["cards"]) == ("71.50", "22.00", 3)
+        assert [(d["title"], d["planned"], d["actual"]) for d in data["days"]] == [
+            ("Day 1", "36.50", "22.00"),
+            ("Day 2", "35.00", "0.00"),
+            ("Day 3", "0.00", "0.00"),
+        ]
+        categories = {c["category"]: c["planned"] for c in data["categories"]}
+        assert categories["museum"] == "36.50"
+        assert categories["restaurant"] == "35.00"
+        assert categories["park"] == "0.00"
+
+    def test_follows_moves_and_deletes(self, auth_client, trip, column):
+        day2 = Column.objects.create(trip_id=trip, title="Day 2", position=1)
+        card = Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=20
+        )
+        other = Attraction.objects.create(
+            column_id=column, title="Orsay", location="Paris", cost=10
+        )
+        url = reverse("trip-budget", args=[trip.id])
+
+        auth_client.patch(
+            reverse("attraction-move", args=[card.id]),
+            {"column_id": day2.id, "position": 0},
+        )
+        days = auth_client.get(url).data["days"]
+        assert [day["planned"] for day in days] == ["10.00", "20.00"]
+
+        auth_client.post(
+            reverse("attraction-bulk-move"),
+            {"moves": [{"id": other.id, "column_id": day2.id, "position": 0}]},
+            format="json",
+        )
+        days = auth_client.get(url).data["days"]
+        assert [day["planned"] for day in days] == ["0.00", "30.00"]
+
+        auth_client.delete(reverse("attraction-detail", args=[card.id]))
+        assert auth_client.get(url).data["planned"] == "10.00"
+
+        day2.delete()
+        assert auth_client.get(url).data["planned"] == "0.00"
+
+    def test_lines_follow_edits(self, auth_client, trip, column):
+        day2 = Column.objects.create(trip_id=trip, title="Day 2", position=1)
+        card = Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=20
+        )
+        url = reverse("attraction-detail", args=[card.id])
+
+        def lines():
+            return sorted(
+                BudgetLine.objects.filter(cards__gt=0).values_list(
+                    "column_id", "category", "planned", "actual", "cards"
+                )
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            auth_client.patch(url, {"title": "Musée du Louvre"})
+        assert not [q for q in queries if "app_budgetline" in q["sql"]]
+
+        auth_client.patch(url, {"cost": "25.00", "category": "museum"})
+        visit = VisitedAttraction.objects.create(
+            attraction_id=card, moment="-", reviewed_at=now(), actualCost=22
+        )
+        visit.actualCost = 30
+        visit.save()
+        assert lines() == [(column.id, "museum", 25, 30, 1)]
+
+        auth_client.patch(
+            reverse("attraction-move", args=[card.id]),
+            {"column_id": day2.id, "position": 0},
+        )
+        assert lines() == [(day2.id, "museum", 25, 30, 1)]
+
+        visit.delete()
+        assert lines() == [(day2.id, "museum", 25, 0, 1)]
+        auth_client.delete(url)
+        assert lines() == []
+
+    def test_other_users_cannot_read(self, api_client, other_user, trip):
+        api_client.force_authenticate(user=other_user)
+        response = api_client.get(reverse("trip-budget", args=[trip.id]))
+        assert response.status_code == 404
+
 
 @pytest.mark.django_db
 class TestSecurity:
@@ -91,6 +497,27 @@ class TestGroupedAttractions:
         assert day2_data["title"] == col2.title
         assert len(day2_data["cards"]) == 0
 
+    def test_query_count_independent_of_board_size(self, auth_client, trip):
+        """The board must not issue extra queries per card (no N+1)."""
+        col1 = Column.objects.create(trip_id=trip, title="Day 1", position=0)
+        col2 = Column.objects.create(trip_id=trip, title="Day 2", position=1)
+        url = f"{reverse('grouped_attractions-list')}?trip_id={trip.id}"
+
+        Attraction.objects.create(column_id=col1, title="A", location="X", cost=0)
+        with CaptureQueriesContext(connection) as small_board:
+            assert auth_client.get(url).status_code == 200
+
+        for i in range(20):
+            Attraction.objects.create(
+                column_id=col1 if i % 2 else col2, title=f"A{i}", location="X", cost=0
+            )
+        with CaptureQueriesContext(connection) as big_board:
+            response = auth_client.get(url)
+
+        assert response.status_code == 200
+        assert sum(len(col["cards"]) for col in response.json()) == 21
+        assert len(big_board) == len(small_board)
+
 
 @pytest.mark.django_db
 class TestPostPermissions:
@@ -132,3 +559,396 @@ class TestPostPermissions:
         response = api_client.get(url)
         assert response.status_code == 200
         assert response.data["title"] == "Public Post"
+
+
+@pytest.mark.django_db
+class TestPostFeed:
+    def test_list_loads_authors_in_the_same_query(
+        self, api_client, user, other_user, django_assert_num_queries
+    ):
+        for author in [user, other_user, user]:
+            Post.objects.create(author=author, title="Trip", content="-")
+
+        with django_assert_num_queries(1):
+            response = api_client.get(reverse("posts-list"))
+
+        assert len(response.data["results"]) == 3
+
+    def test_recent_is_cached_until_a_post_changes(
+        self, api_client, auth_client, user, django_assert_num_queries
+    ):
+        Post.objects.create(author=user, title="Old", content="-")
+        url = reverse("posts-recent")
+        api_client.get(url)
+
+        with django_assert_num_queries(0):
+            cached = api_client.get(url)
+        assert [post["title"] for post in cached.data] == ["Old"]
+
+        auth_client.post(reverse("posts-list"), {"title": "New", "content": "-"})
+        assert [post["title"] for post in api_client.get(url).data] == ["New", "Old"]
+
+        Post.objects.get(title="Old").delete()
+        assert [post["title"] for post in api_client.get(url).data] == ["New"]
+
+    def test_recent_urls_follow_the_host(self, api_client, user, settings):
+        settings.ALLOWED_HOSTS = ["a.example.com", "b.example.com"]
+        Post.objects.create(
+            author=user, title="Beach", content="-", picture="posts/beach.jpg"
+        )
+        url = reverse("posts-recent")
+
+        first = api_client.get(url, HTTP_HOST="a.example.com").data
+        second = api_client.get(url, HTTP_HOST="b.example.com").data
+
+        assert first[0]["picture"] == "http://a.example.com/media/posts/beach.jpg"
+        assert second[0]["picture"] == "http://b.example.com/media/posts/beach.jpg"
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    def test_idle_board_answers_304_after_one_query(
+        self, auth_client, column, django_assert_num_queries
+    ):
+        attraction = Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=0
+        )
+        url = reverse("grouped_attractions-list") + f"?trip_id={column.trip_id_id}"
+        etag = auth_client.get(url).headers["ETag"]
+
+        with django_assert_num_queries(1):
+            response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+        auth_client.patch(
+            reverse("attraction-move", args=[attraction.id]),
+            {"column_id": column.id, "position": 0},
+        )
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_bulk_changes_and_deletes_change_the_version(self, auth_client, column):
+        a, b = (
+            Attraction.objects.create(column_id=column, title=t, location="X", cost=0)
+            for t in "AB"
+        )
+        url = reverse("grouped_attractions-list") + f"?trip_id={column.trip_id_id}"
+        changes = [
+            lambda: auth_client.post(
+                reverse("trip-import-board", args=[column.trip_id_id]),
+                [{"title": "Day 2", "cards": []}],
+                format="json",
+            ),
+            lambda: auth_client.post(
+                reverse("attraction-bulk-move"),
+                {"moves": [{"id": b.id, "column_id": column.id, "position": 0}]},
+                format="json",
+            ),
+            lambda: auth_client.delete(reverse("attraction-detail", args=[a.id])),
+        ]
+        for change in changes:
+            etag = auth_client.get(url).headers["ETag"]
+            change()
+            assert auth_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_post_listings(self, api_client, user, django_assert_num_queries):
+        post = Post.objects.create(author=user, title="Rome", content="-")
+        urls = [reverse("posts-list"), reverse("posts-recent")]
+        etags = {}
+        for url in urls:
+            etags[url] = api_client.get(url).headers["ETag"]
+            with django_assert_num_queries(0):
+                response = api_client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 304
+
+        post.delete()
+        for url in urls:
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            assert response.status_code == 200
+
+
+@pytest.mark.django_db
+class TestContentAddressedUploads:
+    @pytest.fixture(autouse=True)
+    def media(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+        settings.MAX_UPLOAD_SIZE = 1024
+        return tmp_path
+
+    def upload(self, client, content, name="photo.jpg"):
+        return client.post(
+            reverse("upload-image"),
+            {"image": SimpleUploadedFile(name, content)},
+            format="multipart",
+        )
+
+    def test_same_content_is_stored_once(self, auth_client, media):
+        first = self.upload(auth_client, b"same bytes", "a.jpg")
+        second = self.upload(auth_client, b"same bytes", "b.JPG")
+
+        assert first.status_code == second.status_code == 200
+        assert first.data["name"] == second.data["name"]
+        assert first.data["name"].startswith("blobs/")
+        assert len([p for p in media.rglob("*") if p.is_file()]) == 1
+        assert Blob.objects.get().refcount == 2
+
+        for response in (first, second):
+            url = reverse("upload-detail", args=[response.data["id"]])
+            assert auth_client.delete(url).status_code == 204
+        assert Blob.objects.get().refcount == 0
+
+    def test_only_the_owner_deletes_an_upload(self, api_client, user, other_user):
+        api_client.force_authenticate(user=user)
+        upload = self.upload(api_client, b"mine").data
+        api_client.force_authenticate(user=other_user)
+
+        url = reverse("upload-detail", args=[upload["id"]])
+        assert api_client.delete(url).status_code == 404
+        assert Blob.objects.get().refcount == 1
+
+    def test_rejects_oversized_upload(self, auth_client, media):
+        response = self.upload(auth_client, b"x" * 4096)
+
+        assert response.status_code == 413
+        assert not Blob.objects.exists()
+        assert not [p for p in media.rglob("*") if p.is_file()]
+
+    def test_visits_share_and_release_blobs(self, column):
+        attraction = Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=0
+        )
+        for _ in range(2):
+            VisitedAttraction.objects.create(
+                attraction_id=attraction,
+                moment="-",
+                reviewed_at=now(),
+                actualCost=10,
+                images=SimpleUploadedFile("louvre.jpg", b"photo"),
+            )
+
+        blob = Blob.objects.get()
+        assert blob.refcount == 2
+        VisitedAttraction.objects.first().delete()
+        blob.refresh_from_db()
+        assert blob.refcount == 1
+
+        # Uploading the same image again swaps one reference for another.
+        visit = VisitedAttraction.objects.get()
+        visit.images = SimpleUploadedFile("again.jpg", b"photo")
+        visit.save()
+        blob.refresh_from_db()
+        assert blob.refcount == 1
+
+
+@pytest.mark.django_db
+class TestVisitPhotos:
+    @pytest.fixture
+    def visit(self, settings, tmp_path, column):
+        settings.MEDIA_ROOT = tmp_path
+        settings.IMAGE_WORKERS = 0
+        settings.PHOTO_PROCESSES = 0
+        attraction = Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=0
+        )
+        return VisitedAttraction.objects.create(
+            attraction_id=attraction, moment="-", reviewed_at=now(), actualCost=10
+        )
+
+    def jpeg(self, name, size):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "blue").save(buffer, "JPEG")
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_batch_upload_is_processed_after_response(
+        self, auth_client, visit, django_capture_on_commit_callbacks
+    ):
+        url = reverse("visited-photos", args=[visit.id])
+        photos = [
+            self.jpeg("a.jpg", (3200, 2400)),
+            self.jpeg("b.jpg", (400, 600)),
+            SimpleUploadedFile("notes.jpg", b"not an image"),
+        ]
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = auth_client.post(url, {"photos": photos}, format="multipart")
+
+        assert response.status_code == 202
+        assert [photo["status"] for photo in response.data] == ["pending"] * 3
+
+        for callback in callbacks:
+            callback()
+        listed = auth_client.get(url).data
+        assert [photo["status"] for photo in listed] == ["ready", "ready", "failed"]
+        assert [(photo["width"], photo["height"]) for photo in listed[:2]] == [
+            (1600, 1200),
+            (400, 600),
+        ]
+        thumbnail = VisitPhoto.objects.get(id=listed[0]["id"]).thumbnail
+        with thumbnail.open() as f, Image.open(f) as image:
+            assert image.size == (320, 320)
+
+    def test_create_visit(self, auth_client, column):
+        attraction = Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=0
+        )
+        response = auth_client.post(
+            reverse("visited-list"),
+            {"attraction_id": attraction.id, "moment": "-", "actualCost": "12.00"},
+        )
+
+        assert response.status_code == 201
+        assert response.data["reviewed_at"] is not None
+
+    def test_other_users_cannot_upload(self, api_client, other_user, visit):
+        api_client.force_authenticate(user=other_user)
+        response = api_client.post(
+            reverse("visited-photos", args=[visit.id]),
+            {"photos": [self.jpeg("a.jpg", (10, 10))]},
+            format="multipart",
+        )
+
+        assert response.status_code == 404
+        assert not VisitPhoto.objects.exists()
+
+
+@pytest.mark.django_db
+class TestAsyncReadPath:
+    def test_payloads_match_the_viewsets(self, bearer_client, user, column):
+        Attraction.objects.create(
+            column_id=column, title="Louvre", location="Paris", cost=12
+        )
+        Post.objects.create(author=user, title="Rome", content="-")
+        trip_id = column.trip_id_id
+        pairs = [
+            ("trip-list", "async-trip-list", [], ""),
+            ("trip-detail", "async-trip-detail", [trip_id], ""),
+            (
+                "grouped_attractions-list",
+                "async-grouped-attractions",
+                [],
+                f"?trip_id={trip_id}",
+            ),
+            ("posts-list", "async-posts-list", [], ""),
+            ("posts-recent", "async-posts-recent", [], ""),
+        ]
+        for sync_name, async_name, args, query in pairs:
+            expected = bearer_client.get(reverse(sync_name, args=args) + query)
+            response = bearer_client.get(reverse(async_name, args=args) + query)
+            assert response.status_code == 200, async_name
+            assert response.json() == expected.json(), async_name
+
+    def test_board_queries_and_304(
+        self, bearer_client, column, django_assert_num_queries
+    ):
+        Attraction.objects.create(column_id=column, title="Louvre", cost=0)
+        url = reverse("async-grouped-attractions") + f"?trip_id={column.trip_id_id}"
+
+        # Trip, columns, cards: the user comes from the token.
+        with django_assert_num_queries(3):
+            response = bearer_client.get(url)
+        with django_assert_num_queries(1):
+            cached = bearer_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        assert cached.status_code == 304
+
+    def test_auth_and_ownership(self, api_client, other_user, trip):
+        assert api_client.get(reverse("async-trip-list")).status_code == 401
+        assert api_client.get(reverse("async-posts-list")).status_code == 200
+
+        api_client.credentials(HTTP_AUTHORIZATION="Bearer not-a-token")
+        assert api_client.get(reverse("async-trip-list")).status_code == 401
+
+        token = PlannerRefreshToken.for_user(other_user).access_token
+        api_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = api_client.get(reverse("async-trip-detail", args=[trip.id]))
+        assert response.status_code == 404
+        assert response.json() == {"detail": "No Trip matches the given query."}
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    @pytest.fixture(autouse=True)
+    def empty_registry(self, settings):
+        settings.METRICS_TOKEN = "scrape-me"
+        registry.clear()
+
+    def scrape(self, client):
+        response = client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        assert response.status_code == 200
+        return response.content.decode()
+
+    def test_routes_are_measured(self, client, bearer_client, trip):
+        bearer_client.get(reverse("trip-list"))
+        bearer_client.get(reverse("trip-list"))
+        bearer_client.get(reverse("async-trip-list"))
+        bearer_client.get("/no/such/page/")
+
+        text = self.scrape(client)
+        trips = 'route="trip-list",method="GET"'
+        assert f"planner_http_request_duration_seconds_count{{{trips}}} 2" in text
+        assert f'planner_db_queries_per_request_bucket{{{trips},le="0"}} 0' in text
+        assert f'planner_db_queries_per_request_bucket{{{trips},le="1"}} 2' in text
+        assert f"planner_db_queries_per_request_sum{{{trips}}} 2" in text
+        # Queries of async views run on another thread and still count.
+        assert (
+            'planner_db_queries_per_request_sum{route="async-trip-list",'
+            'method="GET"} 1' in text
+        )
+        assert 'route="unmatched",method="GET"' in text
+
+    def test_endpoint_is_protected(self, client, settings):
+        assert client.get("/metrics").status_code == 401
+        wrong = client.get("/metrics", HTTP_AUTHORIZATION="Bearer nope")
+        assert wrong.status_code == 401
+
+        settings.METRICS_TOKEN = ""
+        response = client.get("/metrics", HTTP_AUTHORIZATION="Bearer ")
+        assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestServerTiming:
+    def phases(self, response):
+        entries = response["Server-Timing"].split(", ")
+        return {entry.split(";")[0] for entry in entries}
+
+    def test_move_is_broken_down(self, settings, auth_client, column):
+        settings.SERVER_TIMING = True
+        attraction = Attraction.objects.create(column_id=column, title="Louvre", cost=0)
+
+        response = auth_client.patch(
+            reverse("attraction-move", args=[attraction.id]),
+            {"column_id": column.id, "position": 0},
+        )
+
+        assert response.status_code == 200
+        assert self.phases(response) == {
+            "auth",
+            "perm",
+            "serialize",
+            "render",
+            "db",
+            "total",
+        }
+        assert 'desc="' in response["Server-Timing"]
+
+    def test_list_serialization_is_timed(self, settings, auth_client, trip):
+        settings.SERVER_TIMING = True
+        response = auth_client.get(reverse("trip-list"))
+
+        assert response.status_code == 200
+        assert {"serialize", "render"} <= self.phases(response)
+
+    def test_board_and_async_views(self, settings, bearer_client, column):
+        settings.SERVER_TIMING = True
+        query = f"?trip_id={column.trip_id_id}"
+
+        board = bearer_client.get(reverse("grouped_attractions-list") + query)
+        assert {"serialize", "render", "db"} <= self.phases(board)
+        async_board = bearer_client.get(reverse("async-grouped-attractions") + query)
+        assert {"auth", "serialize", "db"} <= self.phases(async_board)
+
+    def test_off_by_default(self, auth_client, trip):
+        response = auth_client.get(reverse("trip-list"))
+        assert "Server-Timing" not in response
@@ -0,0 +1,45 @@
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import USER_CLAIMS
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that builds request.user from the token claims (id,
+    email, name) instead of loading the row on every request.
+    The user is a real, deferred User instance, so owner= filters and
+    foreign key assignments work as usual; reading any other field loads
+    the rest of the row once (see User.refresh_from_db).
+    Tokens without the claims (issued before they were added) fall back
+    to the database lookup. Deactivating a user takes effect when their
+    access token expires.
+    """
+
+    def get_user(self, validated_token):
+        user = self.user_from_claims(validated_token)
+        if user is None:
+            return super().get_user(validated_token)
+        return user
+
+    def user_from_claims(self, validated_token):
+        """
+        The deferred User built from the token claims, or None when the
+        token predates them. Never queries, so async views can call it.
+        """
+        claims = {api_settings.USER_ID_FIELD: api_settings.USER_ID_CLAIM}
+        claims.update((field, field) for field in USER_CLAIMS)
+        try:
+            # from_db() expects the values in model field order.
+            loaded = {
+                field.attname: validated_token[claims[field.attname]]
+                for field in self.user_model._meta.concrete_fields
+                if field.attname in claims
+            }
+        except KeyError:
+            return None
+
+        return self.user_model.from_db(
+            DEFAULT_DB_ALIAS, list(loaded), list(loaded.values())
+        )
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+class Overloaded(Exception):
+    """
+    Raised when every hashing slot is taken; the caller should answer 503.
+    """
+
+
+class HashingPool:
+    """
+    Runs password hashing (PBKDF2 and friends) on a bounded thread pool.
+    hashlib releases the GIL while hashing, so hashes run in parallel and the
+    event loop keeps serving other requests meanwhile.
+    At most `workers + backlog` hashes are admitted at once; past that, run()
+    fails fast with Overloaded instead of queueing requests that would time
+    out anyway.
+    """
+
+    def __init__(self, workers, backlog):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self.slots = threading.BoundedSemaphore(workers + backlog)
+
+    async def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise Overloaded
+        future = self.executor.submit(func, *args)
+        # Released when the hash is done, even if the client went away.
+        future.add_done_callback(lambda _: self.slots.release())
+        return await asyncio.wrap_future(future)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hashing_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashingPool(
+                settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_BACKLOG
+            )
+    return _pool
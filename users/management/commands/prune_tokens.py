@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding tokens and their blacklist entries in "
+        "small chunks, so the tables stop growing without one long delete "
+        "locking them. Meant to run on a schedule (e.g. nightly cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk", type=int, default=1000, help="Tokens deleted per batch."
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches to spread the load.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the expired tokens.",
+        )
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=now())
+        if options["dry_run"]:
+            self.stdout.write(f"{expired.count()} expired tokens would be deleted.")
+            return
+
+        deleted = 0
+        last_id = 0
+        while True:
+            # Walk the primary key instead of re-filtering from the start:
+            # expires_at has no index, and each batch only reads new rows.
+            ids = list(
+                expired.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["chunk"]]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            deleted += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired tokens."))
@@ -40,3 +40,11 @@ class User(AbstractUser):
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Reading one deferred field (e.g. on the claims-built request.user)
+        # loads all of them in one query instead of one query per field.
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using, fields, from_queryset)
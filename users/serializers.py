@@ -1,6 +1,14 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 
 from .models import User
+from .tokens import PlannerRefreshToken, is_revoked
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -11,8 +19,28 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop("password", None)
+        # Already hashed off the request thread (see register_view).
+        password_hash = validated_data.pop("password_hash", None)
         instance = self.Meta.model(**validated_data)
-        if password is not None:
+        if password_hash is not None:
+            instance.password = password_hash
+        elif password is not None:
             instance.set_password(password)
         instance.save()
         return instance
+
+
+class PlannerTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = PlannerRefreshToken
+
+
+class PlannerTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = PlannerRefreshToken
+
+
+class PlannerTokenVerifySerializer(TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs["token"])
+        if is_revoked(token.get(api_settings.JTI_CLAIM)):
+            raise serializers.ValidationError("Token is blacklisted")
+        return {}
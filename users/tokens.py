@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# User fields copied into every token, so authentication can build
+# request.user without a query (see users.authentication).
+USER_CLAIMS = ("email", "name")
+
+
+class RevokedTokens:
+    """
+    In-process LRU of blacklist lookups by JTI. A blacklisted token never
+    becomes valid again, so a revoked entry is kept until evicted. A token
+    found valid is remembered for `valid_ttl` seconds only: this is how long
+    a token revoked by another process may still be accepted here. Tokens
+    blacklisted by this process are seen at once.
+    """
+
+    def __init__(self, maxsize, valid_ttl=0):
+        self.maxsize = maxsize
+        self.valid_ttl = valid_ttl
+        # JTI -> None when revoked, else when the "valid" answer expires.
+        self._jtis = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, jti):
+        return self.get(jti) is True
+
+    def get(self, jti):
+        """
+        True when `jti` is known to be revoked, False when it was found valid
+        less than valid_ttl seconds ago, None when it has to be looked up.
+        """
+        with self._lock:
+            if jti not in self._jtis:
+                return None
+            expires = self._jtis[jti]
+            if expires is not None and expires <= time.monotonic():
+                del self._jtis[jti]
+                return None
+            self._jtis.move_to_end(jti)
+            return expires is None
+
+    def add(self, jti):
+        self._set(jti, None)
+
+    def add_valid(self, jti):
+        if self.valid_ttl > 0:
+            self._set(jti, time.monotonic() + self.valid_ttl)
+
+    def _set(self, jti, expires):
+        with self._lock:
+            self._jtis[jti] = expires
+            self._jtis.move_to_end(jti)
+            while len(self._jtis) > self.maxsize:
+                self._jtis.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._jtis.clear()
+
+
+revoked_tokens = RevokedTokens(
+    settings.REVOKED_TOKEN_CACHE_SIZE, settings.REVOKED_TOKEN_VALID_TTL
+)
+
+
+def is_revoked(jti):
+    revoked = revoked_tokens.get(jti)
+    if revoked is not None:
+        return revoked
+    if BlacklistedToken.objects.filter(token__jti=jti).exists():
+        revoked_tokens.add(jti)
+        return True
+    revoked_tokens.add_valid(jti)
+    return False
+
+
+class PlannerRefreshToken(RefreshToken):
+    """
+    Refresh token carrying USER_CLAIMS; access tokens derived from it (on
+    login or refresh) copy them. Blacklist checks go through revoked_tokens.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for field in USER_CLAIMS:
+            token[field] = getattr(user, field)
+        return token
+
+    def check_blacklist(self):
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        revoked_tokens.add(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
@@ -1,10 +1,10 @@
 from django.urls import path
 
-from .views import LoginView, LogoutView, RegisterView, UserView
+from .views import LogoutView, UserView, login_view, register_view
 
 urlpatterns = [
-    path("register", RegisterView.as_view()),
-    path("login", LoginView.as_view()),
+    path("register", register_view),
+    path("login", login_view),
     path("user", UserView.as_view()),
     path("logout", LogoutView.as_view()),
 ]
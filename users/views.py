@@ -1,61 +1,116 @@
-from django.contrib.auth import authenticate
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework import status
-from rest_framework.exceptions import AuthenticationFailed
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import TokenError
-from rest_framework_simplejwt.tokens import RefreshToken
-
-from .serializers import UserSerializer
-
-
-class RegisterView(APIView):
-    permission_classes = [AllowAny]
 
-    def post(self, request):
-        serializer = UserSerializer(data=request.data)
-
-        if serializer.is_valid():
-            user = serializer.save()
-            refresh = RefreshToken.for_user(user)
-
-            return Response(
-                {
-                    "user": serializer.data,
-                    "access": str(refresh.access_token),
-                    "refresh": str(refresh),
-                },
-                status=status.HTTP_201_CREATED,
-            )
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+from app.timing import ServerTimingMixin
 
+from .hashing import Overloaded, hashing_pool
+from .models import User
+from .serializers import UserSerializer
+from .tokens import PlannerRefreshToken
 
-class LoginView(APIView):
-    permission_classes = [AllowAny]
 
-    def post(self, request):
-        email = request.data["email"]
-        password = request.data["password"]
-
-        user = authenticate(username=email, password=password)
+def _payload(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+def _tokens(user):
+    # Creates the OutstandingToken row of the refresh token.
+    refresh = PlannerRefreshToken.for_user(user)
+    return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
+
+def _overloaded():
+    response = JsonResponse(
+        {"detail": "Too many sign-ins in progress, please retry."}, status=503
+    )
+    response["Retry-After"] = "1"
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def register_view(request):
+    """
+    Create an account and return it with a token pair.
+    Async: the password is hashed on the bounded hashing pool, so a burst of
+    sign-ups does not hold a worker for each hash.
+    """
+    data = _payload(request)
+    if data is None:
+        return JsonResponse({"detail": "Malformed request body."}, status=400)
+
+    serializer = UserSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    try:
+        encoded = await hashing_pool().run(
+            make_password, serializer.validated_data["password"]
+        )
+    except Overloaded:
+        return _overloaded()
+
+    user = await sync_to_async(serializer.save)(password_hash=encoded)
+    tokens = await sync_to_async(_tokens)(user)
+    return JsonResponse({"user": serializer.data, **tokens}, status=201)
+
+
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    """
+    Exchange an email and password for a token pair.
+    Async counterpart of authenticate(): the hash check runs on the bounded
+    hashing pool and the request gets 503 right away when the pool is full.
+    """
+    data = _payload(request)
+    if data is None or not data.get("email") or not data.get("password"):
+        return JsonResponse({"detail": "Email and password are required."}, status=400)
+
+    user = await User.objects.filter(email=data["email"]).afirst()
+    # Hash even for unknown emails so response times don't reveal which
+    # accounts exist (as ModelBackend does).
+    encoded = user.password if user else ""
+    outdated = []
+    try:
+        valid = await hashing_pool().run(
+            check_password, data["password"], encoded, outdated.append
+        )
+    except Overloaded:
+        return _overloaded()
 
-        if not user:
-            raise AuthenticationFailed("Invalid credentials")
+    if not valid or not user.is_active:
+        return JsonResponse({"detail": "Invalid credentials"}, status=401)
 
-        refresh = RefreshToken.for_user(user)
+    if outdated:
+        # The hasher or its iteration count changed: store a fresh hash.
+        try:
+            user.password = await hashing_pool().run(make_password, outdated[0])
+            await sync_to_async(user.save)(update_fields=["password"])
+        except Overloaded:
+            pass  # Upgraded on a later login.
 
-        return Response(
-            {
-                "access": str(refresh.access_token),
-                "refresh": str(refresh),
-            }
-        )
+    return JsonResponse(await sync_to_async(_tokens)(user))
 
 
-class UserView(APIView):
+class UserView(ServerTimingMixin, APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
@@ -64,7 +119,7 @@ class UserView(APIView):
         return Response(serializer.data)
 
 
-class LogoutView(APIView):
+class LogoutView(ServerTimingMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -76,7 +131,7 @@ class LogoutView(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            token = RefreshToken(refresh_token)
+            token = PlannerRefreshToken(refresh_token)
             token.blacklist()
 
             return Response(